@@ -1,10 +1,18 @@
+import copy
 import random
 
-import pandas as pd
+import numpy as np
 
-from .Tree import Tree
+from .PairMetrics import PairMetrics
+from .Results import Results
 from .Population import Population
 
+NUM_COMBINATIONS = 10_000
+
+# "monte carlo" draws NUM_COMBINATIONS combinations, "exact" tallies their
+# expected calls over all combinations instead
+COMBINATION_MODES = ("monte carlo", "exact")
+
 
 class Analysis:
     def __init__(self):
@@ -13,71 +21,158 @@ class Analysis:
         self.sample_size = None
         self.num_bins = None
         self.combination_number = None
-        self.results = pd.DataFrame({
-            'tier 1': [],
-            'tier 2': [],
-            'clumpiness': [],
-        })
+        self.combination_mode = "monte carlo"
+        self.rng = random
+        self.results = Results()
 
     @classmethod
-    def from_params(cls, analysis_params):
-        obj = cls()
-        obj.sample_size = analysis_params["sample size"]
-        obj.source_pop = Population.from_csv_file(
-            analysis_params["source population file"], obj.sample_size
+    def from_params(cls, analysis_params, rng=None):
+        return cls.from_populations(
+            Population.from_file(
+                analysis_params["source population file"], sample_size=0
+            ),
+            Population.from_file(
+                analysis_params["recipient population file"], sample_size=0
+            ),
+            analysis_params,
+            rng,
         )
-        obj.recipient_pop = Population.from_csv_file(
-            analysis_params["recipient population file"], obj.sample_size
+
+    @classmethod
+    def from_populations(
+        cls, source_pop, recipient_pop, analysis_params, rng=None
+    ):
+        rng = rng or random
+        sample_size = analysis_params["sample size"]
+        return cls.from_samples(
+            source_pop.resample(sample_size, rng),
+            recipient_pop.resample(sample_size, rng),
+            analysis_params,
+            rng,
         )
+
+    @classmethod
+    def from_samples(
+        cls, source_pop, recipient_pop, analysis_params, rng=None
+    ):
+        # populations whose samples are already drawn
+        obj = cls()
+        obj.rng = rng or random
+        obj.sample_size = analysis_params["sample size"]
+        obj.source_pop = source_pop
+        obj.recipient_pop = recipient_pop
         obj.num_bins = analysis_params["number bins"]
         obj.count_populations = bool(int(analysis_params["count populations"]))
         obj.combination_number = analysis_params["combination number"]
+        obj.combination_mode = combination_mode(analysis_params)
 
         return obj
 
-    def perform_analysis(self):
+    def reconfigured(self, analysis_params, rng=None):
+        # same samples with other bins or combination number
+        obj = copy.copy(self)
+        obj.rng = rng or random
+        obj.num_bins = analysis_params["number bins"]
+        obj.combination_number = analysis_params["combination number"]
+        obj.combination_mode = combination_mode(analysis_params)
+        obj.results = Results()
+
+        return obj
+
+    def perform_analysis(self, metrics=None):
+        # metrics of the same samples may be shared between analyses
+        if metrics is None:
+            metrics = PairMetrics.initialized(
+                self.source_pop, self.recipient_pop, self.num_bins
+            )
+        else:
+            metrics = metrics.with_num_bins(self.num_bins)
         if self.combination_number == 1:
-            for source_genome in self.source_pop.sample:
-                for recipient_genome in self.recipient_pop.sample:
-                    tree = Tree.initialized(
-                        source_genome,
-                        recipient_genome,
-                        self.source_pop,
-                        self.recipient_pop
-                    )
-                    self.collect_tree_results([tree])
+            self.collect_pair_results(metrics)
         else:
-            for _ in range(10_000):
-                trees = []
-                for c in range(self.combination_number):
-                    source_genome = random.choice(self.source_pop.sample)
-                    recipient_genome = random.choice(self.recipient_pop.sample)
-                    tree = Tree.initialized(
-                        source_genome,
-                        recipient_genome,
-                        self.source_pop,
-                        self.recipient_pop
-                    )
-                    trees.append(tree)
-
-                if len(trees) != self.combination_number:
-                    raise ValueError(
-                        "Number of trees not equal to combination number"
-                    )
-                self.collect_tree_results(trees)
+            self.collect_combination_results(metrics)
 
     def collect_tree_results(self, trees):
         tier1 = self.collect_tier_1(trees)
         tier2 = self.collect_tier_2(trees)
         clumpiness = self.collect_clumpiness_composite(trees)
 
-        tree_results = pd.DataFrame({
-            'tier 1': [tier1],
-            'tier 2': [tier2],
-            'clumpiness': [clumpiness],
-        })
+        self.results.append(tier1, tier2, clumpiness)
+
+    def collect_pair_results(self, metrics):
+        # calls in source-major order, as when looping over every pair
+        self.results.extend(
+            metrics.tier_1_calls(),
+            metrics.tier_2_calls(),
+            metrics.clumpiness_calls(),
+        )
+
+    def collect_combination_results(self, metrics):
+        # each combination draws combination_number (source, recipient)
+        # pairs uniformly with replacement
+        if self.combination_mode == "exact":
+            self.results.add_expected(
+                *self.expected_combination_calls(metrics), NUM_COMBINATIONS
+            )
+            return
+
+        generator = np.random.default_rng(self.rng.getrandbits(64))
+        shape = (NUM_COMBINATIONS, self.combination_number)
+        sources = generator.integers(len(self.source_pop.sample), size=shape)
+        recipients = \
+            generator.integers(len(self.recipient_pop.sample), size=shape)
+
+        self.results.extend(
+            *self.combination_calls(metrics, sources, recipients)
+        )
+
+    def combination_calls(self, metrics, sources, recipients):
+        # every pair's metrics are computed once, combinations only index
+        # into them: max over a combination for the tiers, sum for clumpiness
+        tier_1 = metrics.check_tier_1()
+        max_src_seg = \
+            tier_1["source segregating"][sources, recipients].max(axis=1)
+        max_rec_seg = \
+            tier_1["recipient segregating"][sources, recipients].max(axis=1)
+
+        tier_2 = metrics.check_tier_2()
+        max_src_on_rec = tier_2["source segregating on recipient"][
+            sources, recipients
+        ].max(axis=1)
+        max_rec_on_src = tier_2["recipient segregating on source"][
+            sources, recipients
+        ].max(axis=1)
+
+        clumpiness_tally = metrics.clumpiness_branch_calls()[
+            sources, recipients
+        ].sum(axis=1)
+
+        return (
+            np.sign(max_src_seg - max_rec_seg),
+            np.sign(max_src_on_rec - max_rec_on_src),
+            np.sign(clumpiness_tally),
+        )
 
-        self.results = pd.concat([self.results, tree_results])
+    def expected_combination_calls(self, metrics):
+        # call probabilities over every combination, so without the noise
+        # of drawing them
+        tier_1 = metrics.check_tier_1()
+        tier_2 = metrics.check_tier_2()
+        return (
+            max_call_probabilities(
+                tier_1["source segregating"],
+                tier_1["recipient segregating"],
+                self.combination_number,
+            ),
+            max_call_probabilities(
+                tier_2["source segregating on recipient"],
+                tier_2["recipient segregating on source"],
+                self.combination_number,
+            ),
+            sum_call_probabilities(
+                metrics.clumpiness_branch_calls(), self.combination_number
+            ),
+        )
 
     def collect_tier_1(self, trees):
         tier_1_results = [tree.check_tier_1() for tree in trees]
@@ -143,3 +238,55 @@ class Analysis:
         if tally < 0:
             return -1
         return 0
+
+
+def combination_mode(analysis_params):
+    mode = analysis_params.get("combination mode", "monte carlo")
+    if mode not in COMBINATION_MODES:
+        raise ValueError(f"unknown combination mode: {mode}")
+    return mode
+
+
+def max_call_probabilities(source, recipient, k):
+    # probabilities of sign(max source - max recipient) over k pairs drawn
+    # uniformly with replacement, indexed by call + 1. The source maximum
+    # is v and above the recipient one when every pair has
+    # max(source, recipient) <= v, less the draws where every pair is
+    # below v or ties or leads with the recipient at v
+    source = np.ravel(source)
+    recipient = np.ravel(recipient)
+    values, inverse = np.unique(
+        np.maximum(source, recipient), return_inverse=True
+    )
+    num_pairs = len(source)
+    at_value = np.bincount(inverse, minlength=len(values)) / num_pairs
+    below = np.cumsum(at_value) - at_value
+    source_ahead = np.bincount(
+        inverse, weights=source > recipient, minlength=len(values)
+    ) / num_pairs
+    recipient_ahead = np.bincount(
+        inverse, weights=recipient > source, minlength=len(values)
+    ) / num_pairs
+
+    correct = np.sum((below + source_ahead) ** k - below ** k)
+    reverse = np.sum((below + recipient_ahead) ** k - below ** k)
+    return np.array([reverse, max(0.0, 1 - correct - reverse), correct])
+
+
+def sum_call_probabilities(branch_calls, k):
+    # probabilities of the sign of a sum of k pair tallies drawn uniformly
+    # with replacement, indexed by call + 1; the sum's distribution is the
+    # k-fold convolution of one pair's
+    branch_calls = np.ravel(branch_calls)
+    low = branch_calls.min()
+    pmf = np.bincount(branch_calls - low) / len(branch_calls)
+    distribution = np.ones(1)
+    for _ in range(k):
+        distribution = np.convolve(distribution, pmf)
+
+    zero = -low * k  # index of a zero sum
+    return np.array([
+        distribution[:max(zero, 0)].sum(),
+        distribution[zero] if 0 <= zero < len(distribution) else 0.0,
+        distribution[max(zero + 1, 0):].sum(),
+    ])
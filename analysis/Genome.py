@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Genome:
     __slots__ = "mutations"
 
@@ -5,9 +8,27 @@ class Genome:
         self.mutations = mutations
 
     def __eq__(self, other):
-        return sorted(self.mutations) == sorted(other.mutations)
+        # interned haplotypes of a population are shared objects
+        if self is other:
+            return True
+        return np.array_equal(
+            self.sorted_mutations(), other.sorted_mutations()
+        )
+
+    def sorted_mutations(self):
+        # genomes of a GenomeStore are sorted already
+        mutations = np.asarray(self.mutations, dtype=np.int32)
+        if np.any(mutations[1:] < mutations[:-1]):
+            return np.sort(mutations)
+        return mutations
+
+    def haplotype_key(self):
+        return self.sorted_mutations().tobytes()
 
     def is_unique_in_population(self, population):
+        if hasattr(population, "count_haplotype"):
+            return population.count_haplotype(self) <= 1
+
         self_counted = False  # genome is in its own population
         for genome in population:
             if genome == self:
@@ -0,0 +1,106 @@
+import numpy as np
+
+from .Genome import Genome
+
+
+class GenomeStore:
+    def __init__(self):
+        # genome i: mutations[offsets[i]:offsets[i + 1]], sorted
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.mutations = np.zeros(0, dtype=np.int32)
+
+    @classmethod
+    def from_table(cls, offsets, mutations):
+        # rows of a population file table, in any order within a row
+        obj = cls()
+        obj.offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(obj.offsets)
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        obj.mutations = np.asarray(
+            mutations[np.lexsort((mutations, rows))], dtype=np.int32
+        )
+        return obj
+
+    @classmethod
+    def unsorted(cls, offsets, mutations):
+        # rows as written, so equal keys only match rows in the same order;
+        # clones copied by the simulator are, which is what makes interning
+        # on these keys before sorting worthwhile
+        obj = cls()
+        obj.offsets = np.asarray(offsets, dtype=np.int64)
+        obj.mutations = np.asarray(mutations, dtype=np.int32)
+        return obj
+
+    @classmethod
+    def from_genomes(cls, genomes):
+        lengths = [len(genome.mutations) for genome in genomes]
+        offsets = np.zeros(len(genomes) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls.from_table(offsets, np.concatenate(
+            [np.zeros(0, dtype=np.int32)]
+            + [
+                np.asarray(genome.mutations, dtype=np.int32)
+                for genome in genomes
+            ]
+        ))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def row_keys(self):
+        # equal genomes have equal keys, see Genome.haplotype_key
+        return list(self.iter_row_keys())
+
+    def iter_row_keys(self):
+        # one row at a time, so a mapped table is never copied whole
+        bounds = self.offsets.tolist()
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield self.mutations[start:end].tobytes()
+
+    def is_sorted(self, chunk_rows=1 << 20):
+        # whether every row is already in order, checked a chunk of rows at
+        # a time
+        for first in range(0, len(self), chunk_rows):
+            last = min(first + chunk_rows, len(self))
+            bounds = np.asarray(self.offsets[first:last + 1]) \
+                - self.offsets[first]
+            mutations = np.asarray(
+                self.mutations[self.offsets[first]:self.offsets[last]]
+            )
+            # pairs across a row boundary may be in any order
+            boundaries = bounds[1:-1]
+            boundaries = boundaries[
+                (boundaries > 0) & (boundaries < len(mutations))
+            ]
+            in_order = np.diff(mutations) >= 0
+            in_order[boundaries - 1] = True
+            if not in_order.all():
+                return False
+        return True
+
+    def sorted(self):
+        if self.is_sorted():
+            return self
+        return GenomeStore.from_table(self.offsets, self.mutations)
+
+    def take(self, rows):
+        # a store of the given rows only
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        obj = GenomeStore()
+        obj.offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=obj.offsets[1:])
+
+        # position k of row r comes from starts[r] + k
+        shifts = np.repeat(starts - obj.offsets[:-1], lengths)
+        obj.mutations = self.mutations[np.arange(obj.offsets[-1]) + shifts]
+        return obj
+
+    def genomes(self):
+        # views into the flat mutation array, nothing is copied
+        bounds = self.offsets.tolist()
+        return [
+            Genome(self.mutations[start:end])
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
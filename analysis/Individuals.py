@@ -0,0 +1,28 @@
+class Individuals:
+    def __init__(self, population):
+        # individuals of a population held as haplotype counts, indexed and
+        # iterated without expanding them
+        self.population = population
+
+    def __len__(self):
+        return self.population.num_individuals()
+
+    def __getitem__(self, individual):
+        if isinstance(individual, slice):
+            return [self[i] for i in range(*individual.indices(len(self)))]
+        if individual < 0:
+            individual += len(self)
+        if not 0 <= individual < len(self):
+            raise IndexError("individual out of range")
+        haplotype = int(self.population.haplotypes_of(individual))
+        return self.population.haplotypes[haplotype]
+
+    def __iter__(self):
+        counts = self.population.haplotype_counts.tolist()
+        for haplotype, count in zip(self.population.haplotypes, counts):
+            for _ in range(count):
+                yield haplotype
+
+    def count_haplotype(self, genome):
+        # lets Genome.is_unique_in_population skip the iteration
+        return self.population.count_haplotype(genome)
@@ -0,0 +1,204 @@
+import copy
+
+import numpy as np
+
+from .Tree import entropies, histograms, proportion_bins
+
+
+class PairMetrics:
+    def __init__(self):
+        self.source_pop = None
+        self.recipient_pop = None
+        self.num_bins = None
+        self.mutations = None  # sorted union of sampled mutations
+        self.source_incidence = None  # source sample x mutations
+        self.recipient_incidence = None  # recipient sample x mutations
+        self.source_proportions = None
+        self.recipient_proportions = None
+        self.tier_counts = {}  # tier metrics do not depend on the bins
+
+    @classmethod
+    def initialized(cls, source_pop, recipient_pop, num_bins):
+        obj = cls()
+        obj.source_pop = source_pop
+        obj.recipient_pop = recipient_pop
+        obj.num_bins = num_bins
+
+        # every source x recipient tree at once:
+        #     shared branch    = source row & recipient row
+        #     source branch    = source row & ~recipient row
+        #     recipient branch = recipient row & ~source row
+        obj.build_incidence()
+        obj.assign_proportions()
+
+        return obj
+
+    def with_num_bins(self, num_bins):
+        # shares the incidence matrices and the computed tier metrics
+        obj = copy.copy(self)
+        obj.num_bins = num_bins
+        return obj
+
+    def build_incidence(self):
+        source_rows, source_mutations = \
+            self.flatten_genomes(self.source_pop.sample)
+        recipient_rows, recipient_mutations = \
+            self.flatten_genomes(self.recipient_pop.sample)
+
+        self.mutations = np.unique(
+            np.concatenate([source_mutations, recipient_mutations])
+        )
+        self.source_incidence = self.incidence_matrix(
+            source_rows, source_mutations, len(self.source_pop.sample)
+        )
+        self.recipient_incidence = self.incidence_matrix(
+            recipient_rows, recipient_mutations, len(self.recipient_pop.sample)
+        )
+
+    def flatten_genomes(self, genomes):
+        lengths = [len(genome.mutations) for genome in genomes]
+        rows = np.repeat(np.arange(len(genomes)), lengths)
+        mutations = np.concatenate(
+            [np.zeros(0, dtype=np.int64)]
+            + [
+                np.asarray(genome.mutations, dtype=np.int64)
+                for genome in genomes
+            ]
+        )
+        return rows, mutations
+
+    def incidence_matrix(self, rows, mutations, num_genomes):
+        # duplicated mutations within a genome collapse to one entry, as in
+        # the dict keyed branches of Tree
+        incidence = np.zeros((num_genomes, len(self.mutations)), dtype=bool)
+        incidence[rows, np.searchsorted(self.mutations, mutations)] = True
+        return incidence
+
+    def assign_proportions(self):
+        self.source_proportions = \
+            self.source_pop.sample_snps.proportions_of(self.mutations)
+        self.recipient_proportions = \
+            self.recipient_pop.sample_snps.proportions_of(self.mutations)
+
+    def segregating(self, proportions):
+        return (proportions > 0) & (proportions < 1)
+
+    def count_shared(self, segregating):
+        # float matmul for BLAS speed; counts are exact well below 2 ** 53
+        source = self.source_incidence[:, segregating].astype(float)
+        recipient = self.recipient_incidence[:, segregating].astype(float)
+        return np.rint(source @ recipient.T).astype(np.int64)
+
+    def count_genome(self, incidence, segregating):
+        return incidence[:, segregating].sum(axis=1)
+
+    def check_tier_1(self):
+        if "tier 1" in self.tier_counts:
+            return self.tier_counts["tier 1"]
+
+        src_segregating = self.segregating(self.source_proportions)
+        rec_segregating = self.segregating(self.recipient_proportions)
+
+        self.tier_counts["tier 1"] = {
+            "source segregating": self.count_shared(src_segregating),
+            "recipient segregating": self.count_shared(rec_segregating),
+        }
+        return self.tier_counts["tier 1"]
+
+    def check_tier_2(self):
+        if "tier 2" in self.tier_counts:
+            return self.tier_counts["tier 2"]
+
+        src_segregating = self.segregating(self.source_proportions)
+        rec_segregating = self.segregating(self.recipient_proportions)
+
+        # branch-only counts are whole genome counts minus the shared branch
+        src_on_rec = (
+            self.count_genome(self.recipient_incidence, src_segregating)
+            [np.newaxis, :]
+            - self.count_shared(src_segregating)
+        )
+        rec_on_src = (
+            self.count_genome(self.source_incidence, rec_segregating)
+            [:, np.newaxis]
+            - self.count_shared(rec_segregating)
+        )
+
+        self.tier_counts["tier 2"] = {
+            "source segregating on recipient": src_on_rec,
+            "recipient segregating on source": rec_on_src,
+        }
+        return self.tier_counts["tier 2"]
+
+    def check_clumpiness_composite(self):
+        # shared | source is the whole source genome and shared | recipient
+        # the whole recipient genome, so the entropies are per genome rather
+        # than per pair
+        return {
+            "ancestral to source lineage": {
+                "source": self.genome_entropies(
+                    self.source_incidence,
+                    self.source_pop,
+                    self.source_proportions,
+                ),
+                "recipient": self.genome_entropies(
+                    self.source_incidence,
+                    self.recipient_pop,
+                    self.recipient_proportions,
+                ),
+            },
+            "ancestral to recipient lineage": {
+                "source": self.genome_entropies(
+                    self.recipient_incidence,
+                    self.source_pop,
+                    self.source_proportions,
+                ),
+                "recipient": self.genome_entropies(
+                    self.recipient_incidence,
+                    self.recipient_pop,
+                    self.recipient_proportions,
+                ),
+            },
+        }
+
+    def genome_entropies(self, incidence, population, proportions):
+        if not self.num_bins:
+            return np.zeros(len(incidence))
+
+        rows, cols = np.nonzero(incidence)
+        bins = proportion_bins(
+            proportions, self.num_bins, len(population.sample)
+        )
+        return entropies(histograms(
+            bins[cols], self.num_bins, rows, len(incidence)
+        ))
+
+    def tier_1_calls(self):
+        tier_1 = self.check_tier_1()
+        return np.sign(
+            tier_1["source segregating"] - tier_1["recipient segregating"]
+        )
+
+    def tier_2_calls(self):
+        tier_2 = self.check_tier_2()
+        return np.sign(
+            tier_2["source segregating on recipient"]
+            - tier_2["recipient segregating on source"]
+        )
+
+    def clumpiness_branch_calls(self):
+        clumpiness = self.check_clumpiness_composite()
+        src_lineage = clumpiness["ancestral to source lineage"]
+        rec_lineage = clumpiness["ancestral to recipient lineage"]
+        src_branch = np.sign(
+            src_lineage["source"] - src_lineage["recipient"]
+        ).astype(np.int64)
+        rec_branch = np.sign(
+            rec_lineage["source"] - rec_lineage["recipient"]
+        ).astype(np.int64)
+
+        # per pair tally: src_branch[i] + rec_branch[j]
+        return src_branch[:, np.newaxis] + rec_branch[np.newaxis, :]
+
+    def clumpiness_calls(self):
+        return np.sign(self.clumpiness_branch_calls())
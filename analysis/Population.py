@@ -1,18 +1,50 @@
+import copy
 import random
+
+import numpy as np
+
 from .Genome import Genome
+from .GenomeStore import GenomeStore
+from .Individuals import Individuals
+from .SnpTable import SnpTable
+from .population_io import (
+    is_binary_file,
+    is_haplotype_file,
+    line_index,
+    read_binary_table,
+    read_csv_lines,
+    read_csv_table,
+    read_haplotype_table,
+    reservoir_sample_lines,
+)
 
 
 class Population:
     def __init__(self):
         self.population_file = None
         self.sample_size = None
-        self.population = []
+        self.rng = random  # anything with random.Random's interface
+        self.population = []  # individuals, references into haplotypes
+        self.haplotypes = []  # unique genomes
+        self.haplotype_counts = None  # individuals carrying each haplotype
+        self.haplotype_of = None  # haplotype index of each individual
+        self.individual_ends = None  # cumulative counts, when not expanded
+        self.haplotype_index = {}  # {haplotype key: haplotype index}
+        self.genome_offsets = None  # genome i: genome_mutations[o[i]:o[i+1]]
+        self.genome_mutations = None
+        self.file_header = None  # only binary population files have one
+        self.sample_only = False  # only sampled genomes are parsed
+        self.line_offsets = None  # line i: bytes [o[i], o[i+1]) of the file
+        self.store = None  # haplotypes as one sorted CSR table
+        self.table_snps = None  # sorted unique mutations of the table
+        self.table_columns = None  # table_snps index of each table entry
         self.sample = []
-        self.sample_snps = {}  # {mutation: {"count": _, "proportion": _ }}
+        self.sample_snps = SnpTable()  # sample allele counts
 
     @classmethod
-    def from_csv_file(cls, population_csv_file, sample_size):
+    def from_csv_file(cls, population_csv_file, sample_size, rng=None):
         obj = cls()
+        obj.rng = rng or random
         obj.population_file = population_csv_file
         obj.sample_size = sample_size
         obj.parse_csv()
@@ -21,45 +53,386 @@ class Population:
         return obj
 
     @classmethod
-    def from_genomes(cls, genomes, sample_size):
+    def from_binary_file(cls, population_binary_file, sample_size, rng=None):
+        obj = cls()
+        obj.rng = rng or random
+        obj.population_file = population_binary_file
+        obj.sample_size = sample_size
+        obj.parse_binary()
+        obj.sample_population()
+        obj.get_sample_snps()
+        return obj
+
+    @classmethod
+    def from_haplotype_file(
+        cls, population_haplotype_file, sample_size, rng=None
+    ):
         obj = cls()
+        obj.rng = rng or random
+        obj.population_file = population_haplotype_file
+        obj.sample_size = sample_size
+        obj.parse_haplotypes()
+        obj.sample_population()
+        obj.get_sample_snps()
+        return obj
+
+    @classmethod
+    def from_file(cls, population_file, sample_size, rng=None):
+        if is_haplotype_file(population_file):
+            return cls.from_haplotype_file(population_file, sample_size, rng)
+        if is_binary_file(population_file):
+            return cls.from_binary_file(population_file, sample_size, rng)
+        return cls.from_csv_file(population_file, sample_size, rng)
+
+    @classmethod
+    def from_file_sample(
+        cls, population_file, sample_size, rng=None, use_line_index=True
+    ):
+        if is_haplotype_file(population_file):
+            # already compact, the whole table is small
+            return cls.from_haplotype_file(population_file, sample_size, rng)
+
+        obj = cls()
+        obj.rng = rng or random
+        obj.population_file = population_file
+        obj.sample_size = sample_size
+        obj.sample_only = True
+        if is_binary_file(population_file):
+            # the mapped offsets already index the genomes
+            obj.genome_offsets, obj.genome_mutations, obj.file_header = \
+                read_binary_table(population_file)
+        elif use_line_index:
+            obj.line_offsets = line_index(population_file)
+        obj.sample_population()
+        obj.get_sample_snps()
+        return obj
+
+    @classmethod
+    def from_genomes(cls, genomes, sample_size, rng=None):
+        obj = cls()
+        obj.rng = rng or random
         obj.sample_size = sample_size
         obj.population = genomes
+        obj.intern_haplotypes()
         obj.sample_population()
         obj.get_sample_snps()
         return obj
 
+    def resample(self, sample_size=None, rng=None):
+        # a new population sharing this one's parsed genomes, with a fresh
+        # sample; the original and its sample are left untouched
+        obj = copy.copy(self)
+        obj.sample_size = self.sample_size if sample_size is None \
+            else sample_size
+        obj.rng = rng or self.rng
+        obj.sample = []
+        obj.sample_snps = SnpTable()
+        obj.sample_population()
+        obj.get_sample_snps()
+        return obj
+
+    def resample_batch(self, num_samples, sample_size=None, generator=None):
+        # num_samples populations with fresh samples, drawn together and
+        # counted in one pass over the haplotype table
+        generator = generator or np.random.default_rng()
+        if not self.sample_only:
+            self.haplotype_table()  # kept for later batches
+        batch = copy.copy(self)
+        batch.sample_size = self.sample_size if sample_size is None \
+            else sample_size
+        if self.sample_only and self.num_individuals() is None:
+            # no index to draw individuals from, sample the file per sample
+            return [
+                batch.resample(rng=random.Random(int(seed)))
+                for seed in generator.integers(2**63, size=num_samples)
+            ]
+
+        individuals = batch.draw_sample_matrix(num_samples, generator)
+        if self.sample_only:
+            # the same individuals a parsed population would give, read
+            # from the file
+            samples = []
+            for row in individuals:
+                sample = copy.copy(batch)
+                sample.sample = batch.read_individuals(row)
+                sample.get_sample_snps()
+                samples.append(sample)
+            return samples
+
+        samples = []
+        for row, snps in zip(
+            individuals, batch.sample_snp_tables(individuals)
+        ):
+            sample = copy.copy(batch)
+            sample.sample = [
+                self.haplotypes[haplotype]
+                for haplotype in self.haplotypes_of(row).tolist()
+            ]
+            sample.sample_snps = snps
+            samples.append(sample)
+        return samples
+
+    def draw_sample_matrix(self, num_samples, generator):
+        # one row of individuals per sample, drawn like draw_individuals:
+        # without replacement unless the population is smaller than a sample
+        num_individuals = self.num_individuals()
+        shape = (num_samples, self.sample_size)
+        if num_individuals < self.sample_size:
+            return generator.integers(num_individuals, size=shape)
+        if self.sample_size ** 2 > num_individuals:
+            # repeats would be common, draw row by row
+            return np.array(
+                [
+                    generator.choice(
+                        num_individuals, self.sample_size, replace=False
+                    )
+                    for _ in range(num_samples)
+                ],
+                dtype=np.int64,
+            ).reshape(shape)
+
+        # redrawing rows with a repeated individual leaves every row
+        # uniform over samples without replacement
+        individuals = generator.integers(num_individuals, size=shape)
+        while True:
+            rows = np.sort(individuals, axis=1)
+            repeated = (rows[:, 1:] == rows[:, :-1]).any(axis=1)
+            if not repeated.any():
+                return individuals
+            individuals[repeated] = generator.integers(
+                num_individuals, size=(repeated.sum(), self.sample_size)
+            )
+
+    def sample_snp_tables(self, individuals):
+        # allele counts of every sample over its occupied (sample, mutation)
+        # cells only; each sampled haplotype's mutations are added once,
+        # weighted by how many of the sample's individuals carry it
+        offsets, _ = self.haplotype_table()
+        num_samples, sample_size = individuals.shape
+        num_haplotypes = len(self.haplotypes)
+        num_snps = len(self.table_snps)
+
+        cells, weights = np.unique(
+            np.arange(num_samples, dtype=np.int64)[:, np.newaxis]
+            * num_haplotypes + self.haplotypes_of(individuals),
+            return_counts=True,
+        )
+        samples, haplotypes = np.divmod(cells, num_haplotypes)
+
+        starts = offsets[haplotypes]
+        lengths = offsets[haplotypes + 1] - starts
+        ends = np.cumsum(lengths)
+        entries = np.arange(ends[-1] if len(ends) else 0) \
+            + np.repeat(starts - (ends - lengths), lengths)
+        snp_cells = np.repeat(samples, lengths) * num_snps \
+            + self.table_columns[entries]
+        order = np.argsort(snp_cells, kind="stable")
+        snp_cells = snp_cells[order]
+        firsts = np.flatnonzero(np.diff(snp_cells, prepend=-1))
+        counts = np.add.reduceat(
+            np.repeat(weights, lengths)[order], firsts
+        ) if len(firsts) else np.zeros(0, dtype=np.int64)
+        cell_samples, columns = np.divmod(snp_cells[firsts], num_snps)
+
+        bounds = np.searchsorted(cell_samples, np.arange(num_samples + 1))
+        return [
+            SnpTable.from_counts(
+                sample_size,
+                self.table_snps[columns[start:end]],
+                counts[start:end],
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def haplotype_table(self):
+        # (offsets, mutations) with one row per haplotype
+        if self.store is None:
+            self.store = GenomeStore.from_genomes(self.haplotypes)
+        if self.table_snps is None:
+            self.table_snps, self.table_columns = np.unique(
+                np.asarray(self.store.mutations, dtype=np.int64),
+                return_inverse=True,
+            )
+        return self.store.offsets, self.store.mutations
+
     def parse_csv(self):
-        with open(self.population_file, "r") as file:
-            for line in file:
-                line = line.strip().strip(',')
-                if line == '':
-                    self.population.append(Genome([]))
-                else:
-                    genome = self.parse_csv_line(line)
-                    self.population.append(genome)
-
-    def parse_csv_line(self, line):
-        return Genome([int(mutation) for mutation in line.split(",")])
+        self.genome_offsets, self.genome_mutations = \
+            read_csv_table(self.population_file)
+        self.intern_haplotypes()
+
+    def parse_binary(self):
+        self.genome_offsets, self.genome_mutations, self.file_header = \
+            read_binary_table(self.population_file)
+        self.intern_haplotypes()
+
+    def intern_haplotypes(self):
+        if self.genome_offsets is None:
+            self.haplotype_index, self.haplotype_of, first_individuals = \
+                intern_keys(
+                    [genome.haplotype_key() for genome in self.population]
+                )
+            self.haplotypes = [
+                self.population[individual]
+                for individual in first_individuals
+            ]
+        else:
+            # clones share their row bytes, so rows are deduplicated as
+            # written, hashing the table (mapped for binary files) a row at a
+            # time, and only the unique ones are copied and sorted; rows
+            # holding the same mutations in another order are merged after
+            table = GenomeStore.unsorted(
+                self.genome_offsets, self.genome_mutations
+            )
+            _, written_of, written_rows = \
+                intern_keys(table.iter_row_keys(), len(table))
+            store = take_rows(table, written_rows).sorted()
+            self.haplotype_index, haplotype_of_written, unique_rows = \
+                intern_keys(store.iter_row_keys(), len(store))
+            self.haplotype_of = haplotype_of_written[written_of]
+
+            # keep one row per haplotype and drop the duplicated clones
+            self.store = take_rows(store, unique_rows)
+            self.genome_offsets = self.store.offsets
+            self.genome_mutations = self.store.mutations
+            self.haplotypes = self.store.genomes()
+
+        self.haplotype_counts = np.bincount(
+            self.haplotype_of, minlength=len(self.haplotypes)
+        )
+        self.population = [
+            self.haplotypes[haplotype]
+            for haplotype in self.haplotype_of.tolist()
+        ]
+
+    def parse_haplotypes(self):
+        # individuals are never expanded: individual i carries the haplotype
+        # whose cumulative count first exceeds i
+        counts, offsets, mutations = \
+            read_haplotype_table(self.population_file)
+        self.store = GenomeStore.from_table(offsets, mutations)
+
+        # rows written in different mutation orders are the same haplotype
+        self.haplotype_index, haplotype_of_row, rows = \
+            intern_keys(self.store.row_keys())
+
+        self.store = self.store.take(rows)
+        self.genome_offsets = self.store.offsets
+        self.genome_mutations = self.store.mutations
+        self.haplotypes = self.store.genomes()
+        self.haplotype_counts = \
+            np.bincount(haplotype_of_row, weights=counts).astype(np.int64)
+        self.individual_ends = np.cumsum(self.haplotype_counts)
+        self.population = Individuals(self)
+
+    def num_individuals(self):
+        # None for a sample only population without an index of its file
+        if self.individual_ends is not None:
+            ends = self.individual_ends
+            return int(ends[-1]) if len(ends) else 0
+        if self.haplotype_of is not None:
+            return len(self.haplotype_of)
+        if self.line_offsets is not None:
+            return len(self.line_offsets) - 1
+        if self.genome_offsets is not None:
+            return len(self.genome_offsets) - 1
+        return None
+
+    def haplotypes_of(self, individuals):
+        individuals = np.asarray(individuals, dtype=np.int64)
+        if self.individual_ends is not None:
+            return np.searchsorted(
+                self.individual_ends, individuals, side="right"
+            )
+        return self.haplotype_of[individuals]
+
+    def count_haplotype(self, genome):
+        haplotype = self.haplotype_index.get(genome.haplotype_key())
+        if haplotype is None:
+            return 0
+        return int(self.haplotype_counts[haplotype])
 
     def sample_population(self):
-        if len(self.population) >= self.sample_size:
-            self.sample = random.sample(self.population, self.sample_size)
+        if self.sample_only:
+            self.sample = self.sample_from_file()
+            return
+
+        # drawing individuals uniformly draws haplotypes weighted by their
+        # counts; individuals keep file order so a seed picks the same ones
+        individuals = self.draw_individuals(self.num_individuals())
+        self.sample = [
+            self.haplotypes[haplotype]
+            for haplotype in self.haplotypes_of(individuals).tolist()
+        ]
+
+    def sample_from_file(self):
+        num_individuals = self.num_individuals()
+        if num_individuals is None:
+            offsets, mutations = reservoir_sample_lines(
+                self.population_file, self.sample_size, self.rng
+            )
+            # sorted like the genomes of a fully parsed population
+            return GenomeStore.from_table(offsets, mutations).genomes()
+        return self.read_individuals(self.draw_individuals(num_individuals))
+
+    def read_individuals(self, individuals):
+        # genomes of the given individuals of an indexed file
+        if self.line_offsets is not None:
+            offsets, mutations = read_csv_lines(
+                self.population_file, self.line_offsets, individuals
+            )
         else:
-            for _ in range(self.sample_size):
-                self.sample.append(random.choice(self.population))
+            bounds = [
+                (self.genome_offsets[individual],
+                 self.genome_offsets[individual + 1])
+                for individual in individuals
+            ]
+            offsets = np.zeros(len(bounds) + 1, dtype=np.int64)
+            np.cumsum([end - start for start, end in bounds], out=offsets[1:])
+            mutations = np.concatenate(
+                [np.zeros(0, dtype=np.int32)]
+                + [self.genome_mutations[start:end] for start, end in bounds]
+            )
+
+        # sorted like the genomes of a fully parsed population
+        return GenomeStore.from_table(offsets, mutations).genomes()
+
+    def draw_individuals(self, num_individuals):
+        if num_individuals >= self.sample_size:
+            individuals = self.rng.sample(
+                range(num_individuals), self.sample_size
+            )
+        else:
+            individuals = [
+                self.rng.randrange(num_individuals)
+                for _ in range(self.sample_size)
+            ]
+
+        return individuals
 
     def get_sample_snps(self):
-        sample_size = len(self.sample)
-        for genome in self.sample:
-            for mutation in genome.mutations:
-                if mutation in self.sample_snps:
-                    count = self.sample_snps[mutation]["count"]
-                    self.sample_snps[mutation] = \
-                        {
-                            "count": count + 1,
-                            "proportion": (count + 1) / sample_size,
-                        }
-                else:
-                    self.sample_snps[mutation] = \
-                        {"count": 1, "proportion": 1 / sample_size}
+        self.sample_snps = SnpTable.from_genomes(self.sample)
+
+
+def intern_keys(keys, num_keys=None):
+    # index of each distinct key in order of first appearance, the index of
+    # every key and the position each distinct key first appears at; keys
+    # may be an iterator of num_keys keys
+    index = {}
+    codes = np.empty(
+        len(keys) if num_keys is None else num_keys, dtype=np.int32
+    )
+    firsts = []
+    for position, key in enumerate(keys):
+        code = index.setdefault(key, len(index))
+        if code == len(firsts):
+            firsts.append(position)
+        codes[position] = code
+    return index, codes, firsts
+
+
+def take_rows(store, rows):
+    # first appearances are in order, so all of them is the store itself,
+    # e.g. a mapped table without clones is left uncopied
+    if len(rows) == len(store):
+        return store
+    return store.take(rows)
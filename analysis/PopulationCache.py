@@ -0,0 +1,35 @@
+import collections
+import os
+
+from .Population import Population
+
+
+class PopulationCache:
+    def __init__(self, max_size=2, sample_only=False):
+        self.max_size = max_size
+        self.sample_only = sample_only  # keep only an index of each file
+        self.populations = collections.OrderedDict()  # least recent first
+
+    def key(self, population_file):
+        stat = os.stat(population_file)
+        return (
+            os.path.abspath(population_file), stat.st_mtime_ns, stat.st_size
+        )
+
+    def get(self, population_file):
+        # parsed once, callers draw their samples with Population.resample
+        key = self.key(population_file)
+        if key in self.populations:
+            self.populations.move_to_end(key)
+            return self.populations[key]
+
+        if self.sample_only:
+            population = \
+                Population.from_file_sample(population_file, sample_size=0)
+        else:
+            population = Population.from_file(population_file, sample_size=0)
+        self.populations[key] = population
+        while len(self.populations) > self.max_size:
+            self.populations.popitem(last=False)
+
+        return population
@@ -0,0 +1,128 @@
+import functools
+import json
+import resource
+import sys
+import time
+
+from .Analysis import Analysis
+from .PairMetrics import PairMetrics
+from .Population import Population
+from .Tree import Tree
+
+
+# (owner, method, stage); stages may nest, e.g. parse csv inside a load
+STAGES = (
+    (Population, "parse_csv", "parse csv"),
+    (Population, "parse_binary", "parse binary"),
+    (Population, "parse_haplotypes", "parse haplotypes"),
+    (Population, "sample_population", "sample population"),
+    (Population, "get_sample_snps", "get sample snps"),
+    (Tree, "initialized", "tree initialized"),
+    (Tree, "check_tier_1", "tree check tier 1"),
+    (Tree, "check_tier_2", "tree check tier 2"),
+    (Tree, "check_clumpiness_composite", "tree check clumpiness"),
+    (PairMetrics, "initialized", "pair metrics initialized"),
+    (PairMetrics, "check_tier_1", "pair metrics check tier 1"),
+    (PairMetrics, "check_tier_2", "pair metrics check tier 2"),
+    (
+        PairMetrics,
+        "check_clumpiness_composite",
+        "pair metrics check clumpiness",
+    ),
+    (Analysis, "collect_tree_results", "collect results"),
+    (Analysis, "collect_pair_results", "collect results"),
+    (Analysis, "collect_combination_results", "collect results"),
+)
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Profiler:
+    def __init__(self):
+        self.stages = {}  # {stage: {"seconds", "calls"}}
+        self.counters = {}
+        # the process high-water mark, not attributable to a stage since it
+        # never comes down after the largest one
+        self.peak_rss_bytes = 0
+        self.originals = []
+
+    def instrument(self, stages=STAGES):
+        for owner, method, stage in stages:
+            original = owner.__dict__[method]
+            self.originals.append((owner, method, original))
+            setattr(owner, method, self.timed(original, stage))
+
+    def uninstrument(self):
+        for owner, method, original in reversed(self.originals):
+            setattr(owner, method, original)
+        self.originals = []
+
+    def timed(self, method, stage):
+        if isinstance(method, classmethod):
+            return classmethod(self.timed(method.__func__, stage))
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    def record(self, stage, seconds, calls=1):
+        stats = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+        stats["seconds"] += seconds
+        stats["calls"] += calls
+        self.peak_rss_bytes = max(self.peak_rss_bytes, peak_rss_bytes())
+
+    def count(self, counter, amount):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def merge(self, other):
+        # e.g. the profile of a task run in a worker process
+        for stage, stats in other.stages.items():
+            merged = self.stages.setdefault(
+                stage, {"seconds": 0.0, "calls": 0}
+            )
+            merged["seconds"] += stats["seconds"]
+            merged["calls"] += stats["calls"]
+        self.peak_rss_bytes = max(self.peak_rss_bytes, other.peak_rss_bytes)
+        for counter, amount in other.counters.items():
+            self.count(counter, amount)
+
+    def summary(self, wall_seconds):
+        trees = self.counters.get("trees", 0)
+        return {
+            "wall seconds": wall_seconds,
+            "peak rss bytes": max(self.peak_rss_bytes, peak_rss_bytes()),
+            "trees": trees,
+            "trees per second": trees / wall_seconds if wall_seconds else 0,
+            "counters": self.counters,
+            "stages": self.stages,
+        }
+
+    def print_summary(self, wall_seconds):
+        summary = self.summary(wall_seconds)
+        print(f"{'stage':<32} {'seconds':>10} {'calls':>10}")
+        for stage, stats in sorted(
+            self.stages.items(), key=lambda item: -item[1]["seconds"]
+        ):
+            print(
+                f"{stage:<32} {stats['seconds']:>10.3f} "
+                f"{stats['calls']:>10}"
+            )
+        print(
+            f"wall {wall_seconds:.3f} s, {summary['trees']} trees, "
+            f"{summary['trees per second']:.0f} trees/s, "
+            f"peak rss {summary['peak rss bytes'] / 2**20:.0f} MiB"
+        )
+
+    def write(self, profile_file, wall_seconds):
+        with open(profile_file, "w") as file:
+            json.dump(self.summary(wall_seconds), file, indent=2)
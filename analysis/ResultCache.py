@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .Results import STATISTICS, Results
+
+
+# parameters that change how a run is executed but not its results
+EXECUTION_PARAMS = (
+    "path to simulation files",
+    "path to simulation parameters",
+    "source population file",
+    "recipient population file",
+    "random seed",  # the seed in use is part of the key
+    "workers",
+    "population cache size",
+    "sample only",
+    "result cache directory",
+    "result store",
+)
+
+
+class ResultCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def params_hash(self, analysis_params):
+        params = {
+            param: value
+            for param, value in analysis_params.items()
+            if param not in EXECUTION_PARAMS
+        }
+        return hashlib.sha256(
+            json.dumps(params, sort_keys=True).encode()
+        ).hexdigest()
+
+    def file_key(self, population_file):
+        # size and mtime, as in PopulationCache; a rewritten file misses
+        stat = os.stat(population_file)
+        return [
+            os.path.basename(population_file), stat.st_size, stat.st_mtime_ns
+        ]
+
+    def key(
+        self, analysis_params, source_pop, recipient_pop, seed, sim_index
+    ):
+        # the task seeds depend on the position of the pair in the run
+        unit = {
+            "params": self.params_hash(analysis_params),
+            "source": self.file_key(source_pop),
+            "recipient": self.file_key(recipient_pop),
+            "seed": seed,
+            "simulation index": sim_index,
+        }
+        return hashlib.sha256(
+            json.dumps(unit, sort_keys=True).encode()
+        ).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as file:
+                entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        results = Results()
+        for stat in STATISTICS:
+            results.tallies[stat] = \
+                np.array(entry["tallies"][stat], dtype=np.float64)
+        return results
+
+    def put(self, key, results, **info):
+        entry = {
+            **info,
+            "tallies": {
+                stat: results.tallies[stat].tolist() for stat in STATISTICS
+            },
+        }
+        self.write_atomic(self.path(key), json.dumps(entry))
+
+    def seed(self, default):
+        # a run without a seed keeps the first one it drew, so a restarted
+        # run finds its completed units
+        seed_file = os.path.join(self.cache_dir, "seed")
+        if os.path.exists(seed_file):
+            with open(seed_file) as file:
+                return int(file.read())
+        self.write_atomic(seed_file, str(default))
+        return default
+
+    def write_atomic(self, path, text):
+        # a preempted write leaves a stray temporary file, never a partial
+        # entry
+        descriptor, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                file.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
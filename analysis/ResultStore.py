@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class ResultStore:
+    def __init__(self, path):
+        # one SQLite file: a row of parameters per analysis run in "runs"
+        # and its per-simulation results in "results"
+        self.path = path
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            # concurrent analyses wait for each other's short write
+            # transactions rather than failing; WAL lets readers go on
+            self.connection = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None
+            )
+            self.connection.execute("PRAGMA busy_timeout = 60000")
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs "
+                "(run INTEGER PRIMARY KEY, created REAL, params TEXT)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (run INTEGER)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_run ON results (run)"
+            )
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def append(self, rows, params):
+        # params that are also columns of rows vary per row and are kept
+        # there only
+        params = {
+            param: value
+            for param, value in params.items()
+            if param not in rows.columns
+        }
+        values = [
+            tuple(
+                value.item() if isinstance(value, np.generic) else value
+                for value in row
+            )
+            for row in rows.itertuples(index=False)
+        ]
+
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            run = connection.execute(
+                "INSERT INTO runs (created, params) VALUES (?, ?)",
+                (time.time(), json.dumps(params, sort_keys=True)),
+            ).lastrowid
+            known = {
+                column[1]
+                for column in connection.execute("PRAGMA table_info(results)")
+            }
+            for column in rows.columns:
+                if column not in known:
+                    connection.execute(
+                        f"ALTER TABLE results ADD COLUMN {quote(column)}"
+                    )
+            columns = ", ".join(
+                quote(column) for column in ["run", *rows.columns]
+            )
+            placeholders = ", ".join("?" * (len(rows.columns) + 1))
+            connection.executemany(
+                f"INSERT INTO results ({columns}) VALUES ({placeholders})",
+                [(run, *row) for row in values],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return run
+
+    def runs(self, params=None):
+        # the parameters of every run, one column each, matching params
+        runs = pd.DataFrame([
+            {"run": run, **json.loads(run_params)}
+            for run, run_params in self.connect().execute(
+                "SELECT run, params FROM runs ORDER BY run"
+            )
+        ])
+        if runs.empty:
+            runs = pd.DataFrame({"run": pd.Series(dtype=np.int64)})
+        return select(runs, params)
+
+    def load(self, params=None):
+        # results joined with the parameters of their runs, filtered on run
+        # parameters and per-row columns alike
+        params = params or {}
+        runs = self.runs()
+        runs = select(runs, {
+            param: value for param, value in params.items()
+            if param in runs.columns
+        })
+        run_list = ", ".join(str(run) for run in runs["run"])
+        results = pd.read_sql_query(
+            f"SELECT * FROM results WHERE run IN ({run_list}) ORDER BY rowid",
+            self.connect(),
+        )
+        results = results.merge(runs, on="run", how="left")
+        return select(results, params).reset_index(drop=True)
+
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def select(frame, params):
+    # rows equal to every given value; params missing from frame match none
+    mask = np.ones(len(frame), dtype=bool)
+    for param, value in (params or {}).items():
+        if param not in frame.columns:
+            return frame.iloc[:0]
+        if isinstance(value, (list, tuple)):
+            # list valued params, e.g. "sampling generations", match whole
+            mask &= frame[param].map(
+                lambda cell: isinstance(cell, (list, tuple))
+                and list(cell) == list(value)
+            ).to_numpy(dtype=bool)
+        else:
+            mask &= (frame[param] == value).to_numpy()
+    return frame[mask]
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+STATISTICS = ("tier 1", "tier 2", "clumpiness")
+
+# tallies are indexed by call + 1
+OUTCOMES = {"correct": 2, "reverse": 0, "ambiguous": 1}
+
+
+class Results:
+    def __init__(self, capacity=0):
+        self.size = 0  # number of stored calls
+        self.calls = {
+            stat: np.zeros(capacity, dtype=np.int8) for stat in STATISTICS
+        }
+        # expected numbers of calls, whole unless added by add_expected
+        self.tallies = {
+            stat: np.zeros(len(OUTCOMES), dtype=np.float64)
+            for stat in STATISTICS
+        }
+
+    def __len__(self):
+        return int(round(self.tallies[STATISTICS[0]].sum()))
+
+    def __getitem__(self, stat):
+        return self.calls[stat][:self.size]
+
+    def reserve(self, capacity):
+        if capacity <= len(self.calls[STATISTICS[0]]):
+            return
+
+        for stat in STATISTICS:
+            calls = np.zeros(capacity, dtype=np.int8)
+            calls[:self.size] = self.calls[stat][:self.size]
+            self.calls[stat] = calls
+
+    def append(self, tier_1, tier_2, clumpiness):
+        if self.size == len(self.calls[STATISTICS[0]]):
+            self.reserve(max(2 * self.size, 1024))
+
+        for stat, call in zip(STATISTICS, (tier_1, tier_2, clumpiness)):
+            self.calls[stat][self.size] = call
+            self.tallies[stat][call + 1] += 1
+        self.size += 1
+
+    def extend(self, tier_1, tier_2, clumpiness):
+        num_calls = np.size(tier_1)
+        self.reserve(self.size + num_calls)
+
+        for stat, calls in zip(STATISTICS, (tier_1, tier_2, clumpiness)):
+            calls = np.asarray(calls, dtype=np.int8).ravel()
+            self.calls[stat][self.size:self.size + num_calls] = calls
+            self.tallies[stat] += np.bincount(calls + 1, minlength=3)
+        self.size += num_calls
+
+    def add_expected(self, tier_1, tier_2, clumpiness, num_calls):
+        # call probabilities indexed by call + 1, tallied as num_calls calls
+        # without storing any
+        for stat, probabilities in zip(
+            STATISTICS, (tier_1, tier_2, clumpiness)
+        ):
+            self.tallies[stat] += num_calls * np.asarray(probabilities)
+
+    def merge(self, other):
+        # stored calls are concatenated and tallies added, expected ones
+        # included
+        self.reserve(self.size + other.size)
+        for stat in STATISTICS:
+            self.calls[stat][self.size:self.size + other.size] = other[stat]
+            self.tallies[stat] += other.tallies[stat]
+        self.size += other.size
+
+    def proportion(self, stat, outcome):
+        total = self.tallies[stat].sum()
+        if total == 0:
+            return float("nan")
+        return self.tallies[stat][OUTCOMES[outcome]] / total
+
+    def to_dataframe(self):
+        return pd.DataFrame({stat: self[stat] for stat in STATISTICS})
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class SnpTable:
+    def __init__(self):
+        self.sample_size = 0
+        self.mutations = np.zeros(0, dtype=np.int64)  # sorted, unique
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_genomes(cls, genomes):
+        obj = cls()
+        obj.sample_size = len(genomes)
+        if genomes:
+            obj.mutations, obj.counts = np.unique(
+                np.concatenate([
+                    np.asarray(genome.mutations, dtype=np.int64)
+                    for genome in genomes
+                ]),
+                return_counts=True,
+            )
+        return obj
+
+    @classmethod
+    def from_counts(cls, sample_size, mutations, counts):
+        obj = cls()
+        obj.sample_size = sample_size
+        obj.mutations = np.asarray(mutations, dtype=np.int64)
+        obj.counts = np.asarray(counts, dtype=np.int64)
+        return obj
+
+    @property
+    def proportions(self):
+        return self.counts / self.sample_size
+
+    def lookup(self, mutations):
+        # index of each mutation in the table, -1 if not in the sample
+        mutations = np.asarray(mutations, dtype=np.int64)
+        indices = np.searchsorted(self.mutations, mutations)
+        found = indices < len(self.mutations)
+        found[found] = self.mutations[indices[found]] == mutations[found]
+        return np.where(found, indices, -1)
+
+    def counts_of(self, mutations):
+        indices = self.lookup(mutations)
+        counts = np.zeros(len(indices), dtype=np.int64)
+        found = indices >= 0
+        counts[found] = self.counts[indices[found]]
+        return counts
+
+    def proportions_of(self, mutations):
+        counts = self.counts_of(mutations)
+        if self.sample_size == 0:
+            return counts.astype(float)
+        return counts / self.sample_size
+
+    def __len__(self):
+        return len(self.mutations)
+
+    def __iter__(self):
+        return iter(self.mutations.tolist())
+
+    def __contains__(self, mutation):
+        return bool(self.lookup([mutation])[0] >= 0)
+
+    def __getitem__(self, mutation):
+        # compatibility with the {mutation: {"count", "proportion"}} dict
+        index = self.lookup([mutation])[0]
+        if index < 0:
+            raise KeyError(mutation)
+        count = int(self.counts[index])
+        return {"count": count, "proportion": count / self.sample_size}
+
+    def __eq__(self, other):
+        return (
+            self.sample_size == other.sample_size
+            and np.array_equal(self.mutations, other.mutations)
+            and np.array_equal(self.counts, other.counts)
+        )
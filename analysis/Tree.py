@@ -1,5 +1,84 @@
+import functools
 import math
 
+import numpy as np
+
+
+def bin_indices(proportions, num_bins):
+    # bins: [ [a, b], (b, c], (c, d], ... ]
+    # note that lowest bin is double inclusive to include 0
+    proportions = np.asarray(proportions, dtype=float)
+    bin_size = 1 / num_bins
+    indices = np.ceil(proportions / bin_size).astype(np.int64) - 1
+    indices[proportions == 0] = 0
+    return indices
+
+
+@functools.lru_cache(maxsize=None)
+def bin_lookup(sample_size, num_bins):
+    # bin index of each possible sample proportion count / sample_size
+    lookup = bin_indices(np.arange(sample_size + 1) / sample_size, num_bins)
+    lookup.flags.writeable = False
+    return lookup
+
+
+def proportion_bins(proportions, num_bins, sample_size=None):
+    proportions = np.asarray(proportions, dtype=float)
+    if sample_size:
+        counts = np.rint(proportions * sample_size).astype(np.int64)
+        if len(counts) == 0 or counts.max() <= sample_size:
+            return bin_lookup(sample_size, num_bins)[counts]
+    return bin_indices(proportions, num_bins)
+
+
+def histograms(bins, num_bins, rows=None, num_rows=1):
+    # one histogram per row, bins past the last one are dropped
+    bins = np.asarray(bins, dtype=np.int64)
+    if rows is None:
+        rows = np.zeros(len(bins), dtype=np.int64)
+    rows = np.asarray(rows, dtype=np.int64)
+    in_range = bins < num_bins
+    return np.bincount(
+        rows[in_range] * num_bins + bins[in_range],
+        minlength=num_rows * num_bins,
+    ).reshape(num_rows, num_bins)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def histogram_entropy(counts):
+    # the terms are summed in bin order with math.log, so equal histograms
+    # up to order compare as they always have
+    total = sum(counts)
+    if len(counts) <= 1 or total <= 1:
+        return 0.0
+
+    props = [count / total for count in counts]
+    return sum([p * math.log(p) if p > 0 else 0 for p in props]) * -1
+
+
+def entropies(binned_proportions):
+    # standard entropy of each row, 0 for a single bin or at most one count;
+    # rows repeat, so each distinct histogram is computed once
+    binned_proportions = np.atleast_2d(binned_proportions)
+    if binned_proportions.size == 0:
+        return np.zeros(len(binned_proportions))
+
+    unique, inverse = np.unique(
+        binned_proportions, axis=0, return_inverse=True
+    )
+    values = np.array(
+        [histogram_entropy(tuple(row)) for row in unique.tolist()]
+    )
+    return values[inverse.reshape(-1)]
+
+
+def sorted_membership(mutations, other):
+    # whether each of the sorted mutations is in the sorted other
+    if len(other) == 0:
+        return np.zeros(len(mutations), dtype=bool)
+    indices = np.searchsorted(other, mutations)
+    return other[np.minimum(indices, len(other) - 1)] == mutations
+
 
 class Tree:
     def __init__(self):
@@ -38,36 +117,33 @@ class Tree:
         return obj
 
     def categorize_mutations(self):
-        for mutation in self.source_genome.mutations:
-            if mutation in self.recipient_genome.mutations:
-                self.shared_branch[mutation] = {}
-            else:
-                self.source_branch[mutation] = {}
+        # a merge of the two sorted genomes instead of list scans
+        source = self.source_genome.sorted_mutations()
+        recipient = self.recipient_genome.sorted_mutations()
+        in_recipient = sorted_membership(source, recipient)
+        in_source = sorted_membership(recipient, source)
 
-        for mutation in self.recipient_genome.mutations:
-            if mutation not in self.source_genome.mutations:
-                self.recipient_branch[mutation] = {}
+        for mutation in source[in_recipient].tolist():
+            self.shared_branch[mutation] = {}
+        for mutation in source[~in_recipient].tolist():
+            self.source_branch[mutation] = {}
+        for mutation in recipient[~in_source].tolist():
+            self.recipient_branch[mutation] = {}
 
     def assign_proportions(self):
+        src_snps = self.source_population.sample_snps
+        rec_snps = self.recipient_population.sample_snps
         for branch in (
             self.shared_branch, self.source_branch, self.recipient_branch
         ):
-            for mutation in branch:
-                if mutation in (
-                    src_snps := self.source_population.sample_snps
-                ):
-                    branch[mutation]["source_proportion"] = \
-                        src_snps[mutation]["proportion"]
-                else:
-                    branch[mutation]["source_proportion"] = 0
-
-                if mutation in (
-                    rec_snps := self.recipient_population.sample_snps
-                ):
-                    branch[mutation]["recipient_proportion"] = \
-                        rec_snps[mutation]["proportion"]
-                else:
-                    branch[mutation]["recipient_proportion"] = 0
+            mutations = list(branch)
+            for mutation, src_proportion, rec_proportion in zip(
+                mutations,
+                src_snps.proportions_of(mutations).tolist(),
+                rec_snps.proportions_of(mutations).tolist(),
+            ):
+                branch[mutation]["source_proportion"] = src_proportion
+                branch[mutation]["recipient_proportion"] = rec_proportion
 
     def count_segregating_snps(self, population, branch):
         segs = 0
@@ -101,13 +177,51 @@ class Tree:
             "recipient segregating on source": rec_on_src
         }
 
+    def sample_size(self, population):
+        population = getattr(self, population + "_population")
+        if population is None:
+            return None
+        return len(population.sample)
+
+    def branch_histogram(self, branch, population, num_bins):
+        proportions = [v[population + "_proportion"] for v in branch.values()]
+        bins = proportion_bins(
+            proportions, num_bins, self.sample_size(population)
+        )
+        return histograms(bins, num_bins)[0]
+
     def check_clumpiness_composite(self, num_bins):
-        ancestral_to_source = self.shared_branch | self.source_branch
-        ancestral_to_recipient = self.shared_branch | self.recipient_branch
-        a_to_s_source_entropy, a_to_s_recipient_entropy = \
-            self.check_clumpiness(ancestral_to_source, num_bins).values()
-        a_to_r_source_entropy, a_to_r_recipient_entropy = \
-            self.check_clumpiness(ancestral_to_recipient, num_bins).values()
+        if not num_bins:
+            return {
+                "ancestral to source lineage": {
+                    "source": 0, "recipient": 0
+                },
+                "ancestral to recipient lineage": {
+                    "source": 0, "recipient": 0
+                },
+            }
+
+        # branches are disjoint, so the histogram of a union of branches is
+        # the sum of the branch histograms; each branch is binned once
+        binned = {
+            population: [
+                self.branch_histogram(branch, population, num_bins)
+                for branch in (
+                    self.shared_branch,
+                    self.source_branch,
+                    self.recipient_branch,
+                )
+            ]
+            for population in ("source", "recipient")
+        }
+        a_to_s_source_entropy, a_to_s_recipient_entropy, \
+            a_to_r_source_entropy, a_to_r_recipient_entropy = \
+            entropies([
+                binned["source"][0] + binned["source"][1],
+                binned["recipient"][0] + binned["recipient"][1],
+                binned["source"][0] + binned["source"][2],
+                binned["recipient"][0] + binned["recipient"][2],
+            ])
 
         return {
             "ancestral to source lineage": {
@@ -145,24 +259,10 @@ class Tree:
         if not proportions or not num_bins:
             return []
 
-        import math
-        bin_size = 1 / num_bins
-
-        # bins: [ [a, b], (b, c], (c, d], ... ]
-        # note that lowest bin is double inclusive to include 0
-        proportions_by_bin_index = []
-        for proportion in proportions:
-            if proportion == 0:
-                proportions_by_bin_index.append(0)
-            else:
-                index = math.ceil(proportion / bin_size) - 1
-                proportions_by_bin_index.append(index)
-
-        return [proportions_by_bin_index.count(bin) for bin in range(num_bins)]
+        return histograms(bin_indices(proportions, num_bins), num_bins)[0] \
+            .tolist()
 
     def standard_entropy(self, binned_proportions):
-        if len(binned_proportions) <= 1 or sum(binned_proportions) == 1:
+        if len(binned_proportions) == 0:
             return 0
-
-        props = [p / sum(binned_proportions) for p in binned_proportions]
-        return sum([p * math.log(p) if p > 0 else 0 for p in props]) * -1
+        return entropies(binned_proportions)[0]
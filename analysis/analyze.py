@@ -1,77 +1,515 @@
+import argparse
+import concurrent.futures
 import glob
+import itertools
 import json
 import os
-import sys
+import random
+import re
+import time
 
+import numpy as np
 import pandas as pd
 
 from .Analysis import Analysis
+from .PairMetrics import PairMetrics
+from .PopulationCache import PopulationCache
+from .Profiler import Profiler
+from .ResultCache import ResultCache
+from .ResultStore import ResultStore
+from .Results import OUTCOMES, STATISTICS, Results
 
+# analysis parameters that may be given as a list of values to sweep over
+SWEEP_PARAMS = (
+    "sample size", "number bins", "combination number", "combination mode"
+)
 
-def calc_proportions(df):
-    proportions = pd.DataFrame()
-    for stat in df.columns:
-        proportions[f'{stat} correct'] = [sum(df[stat] == 1) / len(df[stat])]
-        proportions[f'{stat} reverse'] = [sum(df[stat] == -1) / len(df[stat])]
-        proportions[f'{stat} ambiguous'] = [sum(df[stat] == 0) / len(df[stat])]
+# populations written at one of several "sampling generations" of a run
+TIMEPOINT_PATTERN = re.compile(r"_gen_(\d+)\.\w+$")
 
-    return proportions
 
+def calc_proportions(results):
+    proportions = {}
+    for stat in STATISTICS:
+        for outcome in OUTCOMES:
+            proportions[f'{stat} {outcome}'] = \
+                [results.proportion(stat, outcome)]
 
-# python -m analysis.analyze analysis_params.json
-if __name__ == "__main__":
-    analysis_params_file = sys.argv[1]
+    return pd.DataFrame(proportions)
+
+
+def find_population_files(pop_files_dir):
+    pop_files = [
+        file
+        for extension in ("csv", "bin", "hap")
+        for file in glob.glob(
+            os.path.join(pop_files_dir, f"run*pop*.{extension}")
+        )
+    ]
+    source_pop_files = [file for file in pop_files if "source" in file]
+    recipient_pop_files = [file for file in pop_files if "recipient" in file]
+
+    # ensure files from matching simulation runs are analyzed together,
+    # grouped by timepoint
+    source_pop_files.sort(key=timepoint_sort_key)
+    recipient_pop_files.sort(key=timepoint_sort_key)
+
+    return list(zip(source_pop_files, recipient_pop_files))
+
+
+def population_timepoint(pop_file):
+    # recipient generations a timepoint file was written at, None otherwise
+    match = TIMEPOINT_PATTERN.search(os.path.basename(pop_file))
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+def timepoint_sort_key(pop_file):
+    timepoint = population_timepoint(pop_file)
+    return (timepoint is not None, timepoint or 0, pop_file)
+
+
+# per process, so a worker reuses parsed files across its tasks
+population_cache = None
+
+
+def get_population_cache(max_size, sample_only):
+    global population_cache
+    if (
+        population_cache is None
+        or population_cache.max_size != max_size
+        or population_cache.sample_only != sample_only
+    ):
+        population_cache = PopulationCache(max_size, sample_only)
+    return population_cache
+
+
+def task_seed(seed, sim_index, rep_index=None):
+    # independent stream per (simulation, analysis repetition), so results
+    # do not depend on how tasks are spread over workers; batched runs have
+    # one stream per simulation
+    entropy = [seed, sim_index]
+    if rep_index is not None:
+        entropy.append(rep_index)
+    state = np.random.SeedSequence(entropy)
+    return int(state.generate_state(1, dtype=np.uint64)[0])
+
+
+def sweep_configurations(analysis_params):
+    # list valued parameters are swept over every combination of values
+    swept = [
+        param
+        for param in SWEEP_PARAMS
+        if isinstance(analysis_params.get(param), list)
+    ]
+    return [
+        {**analysis_params, **dict(zip(swept, values))}
+        for values in itertools.product(
+            *(analysis_params[param] for param in swept)
+        )
+    ]
+
+
+def analyze_repetition(
+    configurations,
+    source_pop,
+    recipient_pop,
+    seed,
+    profile=False,
+    repetitions=None,
+):
+    profiler = None
+    if profile:
+        profiler = Profiler()
+        profiler.instrument()
+
+    try:
+        rep_results = analyze_populations(
+            configurations,
+            source_pop,
+            recipient_pop,
+            seed,
+            profiler,
+            repetitions,
+        )
+    finally:
+        if profiler:
+            profiler.uninstrument()
+
+    return rep_results, profiler
+
+
+def analyze_populations(
+    configurations,
+    source_pop,
+    recipient_pop,
+    seed,
+    profiler=None,
+    repetitions=None,
+):
+    analysis_params = configurations[0]
+    cache = get_population_cache(
+        analysis_params.get("population cache size", 2),
+        bool(analysis_params.get("sample only", False)),
+    )
+    source_pop = cache.get(source_pop)
+    recipient_pop = cache.get(recipient_pop)
+
+    # configurations with the same sample size share the samples and the
+    # pair metrics; every configuration sees the random stream a run of it
+    # alone would, so sweeps match single runs
+    sample_sizes = {}
+    for index, config in enumerate(configurations):
+        sample_sizes.setdefault(config["sample size"], []).append(index)
+
+    # only the tallies travel back from worker processes
+    rep_results = [Results() for _ in configurations]
+    for indices in sample_sizes.values():
+        for analysis, state in draw_samples(
+            source_pop,
+            recipient_pop,
+            configurations[indices[0]],
+            seed,
+            repetitions,
+        ):
+            metrics = PairMetrics.initialized(
+                analysis.source_pop, analysis.recipient_pop, None
+            )
+            for index in indices:
+                rng = random.Random()
+                rng.setstate(state)
+                config_analysis = \
+                    analysis.reconfigured(configurations[index], rng)
+                config_analysis.perform_analysis(metrics)
+
+                rep_results[index].merge(config_analysis.results)
+                if profiler:
+                    profiler.count(
+                        "trees",
+                        len(config_analysis.results)
+                        * config_analysis.combination_number,
+                    )
+    return rep_results
+
+
+def draw_samples(
+    source_pop, recipient_pop, analysis_params, seed, repetitions=None
+):
+    # [(analysis, random state after sampling)], one per repetition
+    if repetitions is None:
+        rng = random.Random(seed)
+        analysis = Analysis.from_populations(
+            source_pop, recipient_pop, analysis_params, rng
+        )
+        return [(analysis, rng.getstate())]
+
+    # every repetition's samples drawn at once, with all their allele
+    # counts from one pass over each population's haplotype table
+    generator = np.random.default_rng(seed)
+    sample_size = analysis_params["sample size"]
+    source_samples = \
+        source_pop.resample_batch(repetitions, sample_size, generator)
+    recipient_samples = \
+        recipient_pop.resample_batch(repetitions, sample_size, generator)
 
-    with open(analysis_params_file, 'r') as file:
+    analyses = []
+    for source_sample, recipient_sample, rep_seed in zip(
+        source_samples,
+        recipient_samples,
+        generator.integers(2**63, size=repetitions).tolist(),
+    ):
+        rng = random.Random(rep_seed)
+        analysis = Analysis.from_samples(
+            source_sample, recipient_sample, analysis_params, rng
+        )
+        analyses.append((analysis, rng.getstate()))
+    return analyses
+
+
+def run_analyses(
+    analysis_params,
+    pop_file_pairs,
+    seed,
+    workers=1,
+    profiler=None,
+    result_cache=None,
+):
+    return run_sweep(
+        [analysis_params],
+        pop_file_pairs,
+        seed,
+        workers,
+        profiler,
+        result_cache,
+    )[0]
+
+
+def run_sweep(
+    configurations,
+    pop_file_pairs,
+    seed,
+    workers=1,
+    profiler=None,
+    result_cache=None,
+):
+    # sim_results[configuration][simulation]
+    sim_results = [
+        [Results() for _ in pop_file_pairs] for _ in configurations
+    ]
+    cache_keys = [[None for _ in pop_file_pairs] for _ in configurations]
+    pending = {
+        sim_index: list(range(len(configurations)))
+        for sim_index in range(len(pop_file_pairs))
+    }
+    if result_cache:
+        for sim_index, (source_pop, recipient_pop) in \
+                enumerate(pop_file_pairs):
+            for config_index, config in enumerate(configurations):
+                key = result_cache.key(
+                    config, source_pop, recipient_pop, seed, sim_index
+                )
+                cache_keys[config_index][sim_index] = key
+                cached = result_cache.get(key)
+                if cached is not None:
+                    sim_results[config_index][sim_index] = cached
+                    pending[sim_index].remove(config_index)
+            if not pending[sim_index]:
+                print(f"simulation repetition: {sim_index + 1} (cached)")
+                del pending[sim_index]
+
+    # batched runs analyze all repetitions of a simulation in one task
+    repetitions = configurations[0]["analysis repetitions"]
+    batched = bool(configurations[0].get("batch repetitions", False))
+    tasks = [
+        (sim_index, rep_index, source_pop, recipient_pop)
+        for sim_index, (source_pop, recipient_pop) in enumerate(pop_file_pairs)
+        for rep_index in ([None] if batched else range(repetitions))
+        if sim_index in pending
+    ]
+    remaining = {sim_index: repetitions for sim_index in pending}
+    task_repetitions = repetitions if batched else None
+
+    def task_configurations(sim_index):
+        return [configurations[index] for index in pending[sim_index]]
+
+    def collect(sim_index, task_result):
+        rep_results, task_profiler = task_result
+        for config_index, results in zip(pending[sim_index], rep_results):
+            sim_results[config_index][sim_index].merge(results)
+        if profiler:
+            profiler.merge(task_profiler)
+
+        # checkpoint each simulation as soon as its repetitions are done
+        remaining[sim_index] -= task_repetitions or 1
+        if result_cache and remaining[sim_index] == 0:
+            source_pop, recipient_pop = pop_file_pairs[sim_index]
+            for config_index in pending[sim_index]:
+                result_cache.put(
+                    cache_keys[config_index][sim_index],
+                    sim_results[config_index][sim_index],
+                    source_population_file=source_pop,
+                    recipient_population_file=recipient_pop,
+                )
+
+    if workers == 1:
+        for sim_index, rep_index, source_pop, recipient_pop in tasks:
+            if not rep_index:
+                print(f"simulation repetition: {sim_index + 1}")
+            if rep_index is not None:
+                print(f"\tanalysis repetition: {rep_index + 1}")
+            collect(sim_index, analyze_repetition(
+                task_configurations(sim_index),
+                source_pop,
+                recipient_pop,
+                task_seed(seed, sim_index, rep_index),
+                profiler is not None,
+                task_repetitions,
+            ))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = {
+                executor.submit(
+                    analyze_repetition,
+                    task_configurations(sim_index),
+                    source_pop,
+                    recipient_pop,
+                    task_seed(seed, sim_index, rep_index),
+                    profiler is not None,
+                    task_repetitions,
+                ): (sim_index, rep_index)
+                for sim_index, rep_index, source_pop, recipient_pop in tasks
+            }
+            for future in concurrent.futures.as_completed(futures):
+                sim_index, rep_index = futures[future]
+                if rep_index is None:
+                    print(f"simulation repetition: {sim_index + 1}")
+                else:
+                    print(
+                        f"simulation repetition: {sim_index + 1}, "
+                        f"analysis repetition: {rep_index + 1}"
+                    )
+                collect(sim_index, future.result())
+
+    return [
+        [calc_proportions(results) for results in config_results]
+        for config_results in sim_results
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m analysis.analyze")
+    parser.add_argument("analysis_params_file")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help='worker processes, 0 for one per core, overrides "workers" in '
+        "the params file",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help='random seed, overrides "random seed" in the params file',
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each analysis stage and write <results>.profile.json",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="keep finished simulation results here and skip them on rerun, "
+        'overrides "result cache directory" in the params file',
+    )
+    parser.add_argument(
+        "--store",
+        help="append results to this SQLite file instead of writing a json "
+        'file, overrides "result store" in the params file',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with open(args.analysis_params_file, 'r') as file:
         analysis_params = json.load(file)
 
     sim_params_file = analysis_params["path to simulation parameters"]
     with open(sim_params_file, "r") as file:
         sim_params = json.load(file)
 
-    # find all population files belonging to simulation
-    pop_files_dir = analysis_params["path to simulation files"]
-    pop_files = glob.glob(os.path.join(pop_files_dir, "run*pop*.csv"))
-    source_pop_files = [file for file in pop_files if "source" in file]
-    recipient_pop_files = [file for file in pop_files if "recipient" in file]
+    workers = args.workers if args.workers is not None \
+        else analysis_params.get("workers", 1)
+    if workers == 0:
+        workers = os.cpu_count() or 1  # one per core, as for the simulator
+    cache_dir = args.cache_dir or \
+        analysis_params.get("result cache directory")
+    result_cache = ResultCache(cache_dir) if cache_dir else None
+    store_path = args.store or analysis_params.get("result store")
+    result_store = ResultStore(store_path) if store_path else None
+    seed = args.seed
+    if seed is None:
+        seed = analysis_params.get("random seed")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+        if result_cache:
+            seed = result_cache.seed(seed)
+        print(f"random seed: {seed}")
 
-    # ensure files from matching simulation runs are analyzed together
-    source_pop_files.sort()
-    recipient_pop_files.sort()
+    # find all population files belonging to simulation
+    pop_file_pairs = find_population_files(
+        analysis_params["path to simulation files"]
+    )
 
-    # perform analyses
-    all_proportions = []
-    sim_count = 0
-    for source_pop, recipient_pop in zip(
-        source_pop_files, recipient_pop_files
-    ):
-        sim_count += 1
-        print(f"simulation repetition: {sim_count}")
+    # perform analyses, every configuration of a sweep on the same samples
+    configurations = sweep_configurations(analysis_params)
+    profiler = Profiler() if args.profile else None
+    start = time.perf_counter()
+    all_proportions = run_sweep(
+        configurations,
+        pop_file_pairs,
+        seed,
+        workers,
+        profiler,
+        result_cache,
+    )
+    wall_seconds = time.perf_counter() - start
 
-        analysis_params["source population file"] = source_pop
-        analysis_params["recipient population file"] = recipient_pop
+    # each pair is labelled with the recipient generations it was written
+    # at, which differs between the files of a multi-timepoint run
+    timepoints = [
+        population_timepoint(source_pop) for source_pop, _ in pop_file_pairs
+    ]
+    timepoints = [
+        sim_params["recipient generations"] if timepoint is None
+        else timepoint
+        for timepoint in timepoints
+    ]
 
-        sim_results = pd.DataFrame()
-        for rep in range(analysis_params["analysis repetitions"]):
-            print(f"\tanalysis repetition: {rep + 1}")
-            analysis = Analysis.from_params(analysis_params)
-            analysis.perform_analysis()
-            rep_results = analysis.results
-            sim_results = pd.concat([sim_results, rep_results])
+    config_results = []
+    for config, config_proportions in zip(configurations, all_proportions):
+        if pop_file_pairs:
+            source_pop, recipient_pop = pop_file_pairs[-1]
+            config["source population file"] = source_pop
+            config["recipient population file"] = recipient_pop
 
-        all_proportions.append(calc_proportions(sim_results))
+        results = pd.concat(config_proportions, ignore_index=True)
+        sizes = [len(proportions) for proportions in config_proportions]
+        if result_store:
+            # parameters are stored once per configuration, only the
+            # columns that differ between simulations per row
+            results["recipient generations"] = np.repeat(timepoints, sizes)
+            for col, files in zip(
+                ("source population file", "recipient population file"),
+                zip(*pop_file_pairs),
+            ):
+                results[col] = np.repeat(files, sizes)
+            result_store.append(results, {**sim_params, **config})
+            continue
 
-    results = pd.concat(all_proportions, ignore_index=True)
-    for col in sim_params:
-        results[col] = sim_params[col]
-    for col in analysis_params:
-        results[col] = analysis_params[col]
+        # list valued params, e.g. "sampling generations", are one value
+        # per row rather than spread over the rows
+        for col in sim_params:
+            results[col] = [sim_params[col]] * len(results)
+        results["recipient generations"] = np.repeat(timepoints, sizes)
+        for col in config:
+            results[col] = [config[col]] * len(results)
+        config_results.append(results)
 
+    # a sweep over combination numbers is written to one file, e.g. cmb1_3
+    combination_number = analysis_params["combination number"]
+    if isinstance(combination_number, list):
+        combination_number = "_".join(map(str, combination_number))
+    # as is a run sampled at several timepoints, e.g. rec10_50
+    recipient_generations = "_".join(
+        map(str, sorted(set(timepoints)))
+    ) or sim_params["recipient generations"]
     filename = (
         f"src{sim_params['source generations']}-"
-        f"rec{sim_params['recipient generations']}-"
+        f"rec{recipient_generations}-"
         f"bot{sim_params['bottleneck']}-"
-        f"cmb{analysis_params['combination number']}"
+        f"cmb{combination_number}"
         ".json"
     )
-    results.to_json(filename, orient='records')
+    if result_store:
+        result_store.close()
+    else:
+        results = pd.concat(config_results, ignore_index=True)
+        results.to_json(filename, orient='records')
+
+    if profiler:
+        profiler.print_summary(wall_seconds)
+        profile_file = filename.replace(".json", ".profile.json")
+        if result_store:
+            # no results file is written, so the profile sits by the store
+            profile_file = os.path.join(
+                os.path.dirname(store_path), profile_file
+            )
+        profiler.write(profile_file, wall_seconds)
+
+
+# python -m analysis.analyze analysis_params.json [--workers N] [--seed S]
+#     [--cache-dir DIR] [--store FILE]
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from .Analysis import Analysis
+from .Population import Population
+from .Tree import Tree
+from .population_io import write_binary_table, write_haplotype_table
+from .synthetic import synthetic_population, write_population_csv
+
+
+SCALES = {
+    "small": {
+        "carrying capacity": 2_000,
+        "genome size": 2_800_000,
+        "haplotypes": 200,
+        "ancestral mutations": 300,
+        "branch mutations": 2,
+        "sample size": 50,
+        "number bins": 50,
+    },
+    "production": {
+        "carrying capacity": 100_000,
+        "genome size": 2_800_000,
+        "haplotypes": 5_000,
+        "ancestral mutations": 3_000,
+        "branch mutations": 2,
+        "sample size": 100,
+        "number bins": 100,
+    },
+}
+
+COMBINATION_NUMBERS = (1, 3)
+NUM_TREES = 1_000
+
+
+def measure(stages, name, function, *args):
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+
+    stages[name] = {"seconds": seconds, "peak memory bytes": peak_memory}
+    print(f"{name:<40} {seconds:>10.3f} s {peak_memory / 2**20:>10.1f} MiB")
+    return result
+
+
+def build_trees(source_pop, recipient_pop, num_trees, rng):
+    return [
+        Tree.initialized(
+            rng.choice(source_pop.sample),
+            rng.choice(recipient_pop.sample),
+            source_pop,
+            recipient_pop,
+        )
+        for _ in range(num_trees)
+    ]
+
+
+def run_analysis(
+    source_pop, recipient_pop, params, combination_number, rng,
+    combination_mode="monte carlo",
+):
+    analysis = Analysis.from_populations(
+        source_pop,
+        recipient_pop,
+        {**params, "count populations": 0,
+         "combination number": combination_number,
+         "combination mode": combination_mode},
+        rng,
+    )
+    analysis.perform_analysis()
+    return analysis
+
+
+def run_benchmarks(scale, seed=0, directory=None):
+    params = SCALES[scale]
+    rng = random.Random(seed)
+    stages = {}
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        files = {}
+        for offset, population in enumerate(("source", "recipient")):
+            table = measure(
+                stages,
+                f"generate {population}",
+                synthetic_population,
+                params["carrying capacity"],
+                params["genome size"],
+                params["haplotypes"],
+                params["ancestral mutations"],
+                params["branch mutations"],
+                1.2,
+                seed + offset,
+            )
+            files[population] = os.path.join(tmp, f"{population}.csv")
+            write_population_csv(files[population], *table)
+            write_binary_table(f"{files[population]}.bin", *table)
+            del table
+
+        source_pop = measure(
+            stages, "parse csv", Population.from_csv_file,
+            files["source"], 0,
+        )
+        measure(
+            stages, "parse binary", Population.from_file,
+            files["source"] + ".bin", 0,
+        )
+        measure(
+            stages, "sample only load", Population.from_file_sample,
+            files["source"], params["sample size"], rng,
+        )
+        write_haplotype_table(
+            files["source"] + ".hap",
+            source_pop.haplotype_counts,
+            source_pop.genome_offsets,
+            source_pop.genome_mutations,
+        )
+        measure(
+            stages, "parse haplotypes", Population.from_file,
+            files["source"] + ".hap", 0,
+        )
+        recipient_pop = Population.from_csv_file(files["recipient"], 0)
+
+        source_pop = source_pop.resample(params["sample size"], rng)
+        recipient_pop = recipient_pop.resample(params["sample size"], rng)
+        measure(stages, "get sample snps", source_pop.get_sample_snps)
+
+        trees = measure(
+            stages, f"tree initialized x {NUM_TREES}", build_trees,
+            source_pop, recipient_pop, NUM_TREES, rng,
+        )
+        measure(
+            stages, f"tree metrics x {NUM_TREES}",
+            lambda: [
+                (
+                    tree.check_tier_1(),
+                    tree.check_tier_2(),
+                    tree.check_clumpiness_composite(params["number bins"]),
+                )
+                for tree in trees
+            ],
+        )
+        del trees
+
+        for combination_number in COMBINATION_NUMBERS:
+            measure(
+                stages,
+                f"perform analysis combination {combination_number}",
+                run_analysis,
+                source_pop, recipient_pop, params, combination_number, rng,
+            )
+        measure(
+            stages,
+            f"perform analysis combination {COMBINATION_NUMBERS[-1]} exact",
+            run_analysis,
+            source_pop, recipient_pop, params, COMBINATION_NUMBERS[-1], rng,
+            "exact",
+        )
+
+    return stages
+
+
+def compare(stages, baseline):
+    print(f"{'stage':<40} {'baseline':>10} {'current':>10} {'ratio':>8}")
+    for name, stage in stages.items():
+        if name not in baseline["stages"]:
+            continue
+        before = baseline["stages"][name]["seconds"]
+        after = stage["seconds"]
+        print(
+            f"{name:<40} {before:>10.3f} {after:>10.3f} "
+            f"{after / before if before else float('nan'):>8.2f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m analysis.benchmark")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", help="write the measurements to this JSON file"
+    )
+    parser.add_argument(
+        "--compare", help="JSON file from an earlier run to compare against"
+    )
+    parser.add_argument(
+        "--tmp-dir", help="where to write the synthetic population files"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    tracemalloc.start()
+    stages = run_benchmarks(args.scale, args.seed, args.tmp_dir)
+    tracemalloc.stop()
+
+    report = {
+        "scale": args.scale,
+        "seed": args.seed,
+        "parameters": SCALES[args.scale],
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "stages": stages,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(stages, json.load(file))
+
+
+# python -m analysis.benchmark [--scale production] [--output baseline.json]
+if __name__ == "__main__":
+    main()
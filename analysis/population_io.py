@@ -0,0 +1,308 @@
+import os
+import tempfile
+
+import numpy as np
+
+
+NEWLINE = ord("\n")
+COMMA = ord(",")
+ZERO = ord("0")
+NINE = ord("9")
+
+CHUNK_SIZE = 1 << 24
+
+# haplotype table files from the simulator's "haplotypes" output format
+HAPLOTYPE_EXTENSION = ".hap"
+
+# mirrors BinaryPopulationHeader in simulation/population.hpp
+BINARY_MAGIC = b"TSPOPBIN"
+BINARY_VERSION = 1
+BINARY_HEADER = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("genome size", "<i4"),
+    ("run id", "<i4"),
+    ("repetition", "<i4"),
+    ("genome count", "<u8"),
+    ("mutation count", "<u8"),
+])
+
+
+def read_csv_table(population_csv_file, chunk_size=CHUNK_SIZE):
+    # one genome per line, each mutation followed by a comma; returns
+    # (offsets, mutations) where genome i is mutations[offsets[i]:offsets[i+1]]
+    all_lengths = []
+    all_mutations = []
+    with open(population_csv_file, "rb") as file:
+        remainder = b""
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+
+            # only parse whole lines, carry the rest over to the next chunk
+            buffer = remainder + chunk
+            end = buffer.rfind(b"\n") + 1
+            remainder = buffer[end:]
+            if end:
+                lengths, mutations = parse_csv_lines(buffer[:end])
+                all_lengths.append(lengths)
+                all_mutations.append(mutations)
+
+        if remainder:
+            lengths, mutations = parse_csv_lines(remainder + b"\n")
+            all_lengths.append(lengths)
+            all_mutations.append(mutations)
+
+    lengths = np.concatenate(all_lengths or [np.zeros(0, dtype=np.int64)])
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    mutations = np.concatenate(all_mutations or [np.zeros(0, dtype=np.int32)])
+
+    return offsets, mutations
+
+
+def parse_csv_lines(buffer):
+    # buffer holds whole lines, each terminated by a newline
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    newlines = np.flatnonzero(data == NEWLINE)
+
+    is_digit = (data >= ZERO) & (data <= NINE)
+    follows_digit = np.zeros_like(is_digit)
+    follows_digit[1:] = is_digit[:-1]
+    starts = np.flatnonzero(is_digit & ~follows_digit)
+
+    # collapse every run of separators (commas, newlines, whitespace) into a
+    # single comma so numpy's C text parser can read all numbers in one call
+    numbers = np.where(is_digit, data, COMMA).astype(np.uint8)
+    numbers = numbers[is_digit | follows_digit].tobytes()
+    mutations = np.fromstring(numbers, dtype=np.int32, sep=",")
+
+    lines = np.searchsorted(newlines, starts)
+    lengths = np.bincount(lines, minlength=len(newlines))
+
+    return lengths, mutations
+
+
+def is_binary_file(population_file):
+    with open(population_file, "rb") as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def read_binary_header(population_file):
+    header = np.fromfile(population_file, dtype=BINARY_HEADER, count=1)
+    if len(header) == 0 or header["magic"][0] != BINARY_MAGIC:
+        raise ValueError(f"{population_file} is not a binary population file")
+    if header["version"][0] != BINARY_VERSION:
+        raise ValueError(
+            f"{population_file} has unsupported version "
+            f"{header['version'][0]}"
+        )
+
+    return {name: header[name][0].item() for name in BINARY_HEADER.names}
+
+
+def read_binary_table(population_file):
+    # memory maps the file, offsets and mutations are read-only views of it
+    header = read_binary_header(population_file)
+    genome_count = header["genome count"]
+    offsets = np.memmap(
+        population_file,
+        dtype="<i8",
+        mode="r",
+        offset=BINARY_HEADER.itemsize,
+        shape=(genome_count + 1,),
+    )
+    if header["mutation count"] == 0:
+        # an empty region cannot be mapped
+        return offsets, np.zeros(0, dtype="<i4"), header
+
+    mutations = np.memmap(
+        population_file,
+        dtype="<i4",
+        mode="r",
+        offset=BINARY_HEADER.itemsize + offsets.nbytes,
+        shape=(header["mutation count"],),
+    )
+
+    return offsets, mutations, header
+
+
+def write_binary_table(
+    population_file,
+    offsets,
+    mutations,
+    genome_size=0,
+    run_id=0,
+    repetition=0,
+):
+    header = np.zeros(1, dtype=BINARY_HEADER)
+    header["magic"] = BINARY_MAGIC
+    header["version"] = BINARY_VERSION
+    header["genome size"] = genome_size
+    header["run id"] = run_id
+    header["repetition"] = repetition
+    header["genome count"] = len(offsets) - 1
+    header["mutation count"] = len(mutations)
+
+    with open(population_file, "wb") as file:
+        file.write(header.tobytes())
+        file.write(np.asarray(offsets, dtype="<i8").tobytes())
+        file.write(np.asarray(mutations, dtype="<i4").tobytes())
+
+
+def is_haplotype_file(population_file):
+    return str(population_file).endswith(HAPLOTYPE_EXTENSION)
+
+
+def read_haplotype_table(population_haplotype_file):
+    # one haplotype per line, "count:mutation,mutation,...,"; returns
+    # (counts, offsets, mutations) with haplotype i owning
+    # mutations[offsets[i]:offsets[i+1]]
+    line_offsets, values = read_csv_table(population_haplotype_file)
+
+    # the count is each line's first number
+    counts = values[line_offsets[:-1]].astype(np.int64)
+    is_count = np.zeros(len(values), dtype=bool)
+    is_count[line_offsets[:-1]] = True
+    offsets = line_offsets - np.arange(len(line_offsets))
+
+    return counts, offsets, values[~is_count]
+
+
+def write_haplotype_table(
+    population_haplotype_file, counts, offsets, mutations
+):
+    bounds = np.asarray(offsets).tolist()
+    with open(population_haplotype_file, "w") as file:
+        for count, start, end in zip(
+            np.asarray(counts).tolist(), bounds[:-1], bounds[1:]
+        ):
+            file.write(
+                f"{count}:"
+                + "".join(f"{m}," for m in mutations[start:end].tolist())
+                + "\n"
+            )
+
+
+def read_mutation_table(mutation_file):
+    # "mutation,count" lines the simulator writes next to haplotype files
+    table = np.loadtxt(mutation_file, delimiter=",", dtype=np.int64, ndmin=2)
+    return table[:, 0], table[:, 1]
+
+
+def index_csv_lines(population_csv_file, chunk_size=CHUNK_SIZE):
+    # line i spans bytes [offsets[i], offsets[i + 1]), lines as in
+    # read_csv_table
+    ends = []
+    position = 0
+    last_byte = b"\n"
+    with open(population_csv_file, "rb") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            data = np.frombuffer(chunk, dtype=np.uint8)
+            ends.append(np.flatnonzero(data == NEWLINE) + position + 1)
+            position += len(chunk)
+            last_byte = chunk[-1:]
+
+    if last_byte != b"\n":
+        ends.append(np.array([position]))
+
+    return np.concatenate([np.zeros(1, dtype=np.int64)] + ends)
+
+
+def line_index_file(population_csv_file):
+    return f"{population_csv_file}.idx"
+
+
+def load_line_index(population_csv_file):
+    # sidecar layout: [file size, file mtime in ns, offsets...]
+    try:
+        with open(line_index_file(population_csv_file), "rb") as file:
+            index = np.load(file)
+    except (OSError, ValueError, EOFError):
+        return None  # missing or unreadable, e.g. empty, it is rebuilt
+    if index.ndim != 1 or len(index) < 3:
+        return None  # short of the header and the first offset
+
+    stat = os.stat(population_csv_file)
+    if index[0] != stat.st_size or index[1] != stat.st_mtime_ns:
+        return None
+    return index[2:]
+
+
+def build_line_index(population_csv_file):
+    stat = os.stat(population_csv_file)
+    offsets = index_csv_lines(population_csv_file)
+    index = np.concatenate([[stat.st_size, stat.st_mtime_ns], offsets])
+    # written aside and renamed, so a worker indexing the same file at
+    # the same time never reads a partial index
+    path = line_index_file(population_csv_file)
+    try:
+        descriptor, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path))
+        )
+    except OSError:
+        return offsets  # e.g. a read-only results directory, it is optional
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            np.save(file, index.astype(np.int64))
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+
+    return offsets
+
+
+def line_index(population_csv_file):
+    offsets = load_line_index(population_csv_file)
+    if offsets is None:
+        offsets = build_line_index(population_csv_file)
+    return offsets
+
+
+def read_csv_lines(population_csv_file, line_offsets, lines):
+    # parses only the requested lines, returned as a table in request order
+    unique_lines, order = np.unique(lines, return_inverse=True)
+    with open(population_csv_file, "rb") as file:
+        buffers = []
+        for line in unique_lines.tolist():
+            file.seek(line_offsets[line])
+            buffers.append(
+                file.read(line_offsets[line + 1] - line_offsets[line])
+            )
+
+    return csv_table_from_lines([buffers[i] for i in order.tolist()])
+
+
+def reservoir_sample_lines(population_csv_file, sample_size, rng):
+    # one pass without an index; draws with replacement like
+    # Population.sample_population when there are fewer lines than samples
+    reservoir = []
+    num_lines = 0
+    with open(population_csv_file, "rb") as file:
+        for line in file:
+            if num_lines < sample_size:
+                reservoir.append(line)
+            else:
+                replaced = rng.randrange(num_lines + 1)
+                if replaced < sample_size:
+                    reservoir[replaced] = line
+            num_lines += 1
+
+    if num_lines < sample_size and num_lines > 0:
+        reservoir = [rng.choice(reservoir) for _ in range(sample_size)]
+
+    return csv_table_from_lines(reservoir)
+
+
+def csv_table_from_lines(lines):
+    buffer = b"".join(
+        line if line.endswith(b"\n") else line + b"\n" for line in lines
+    )
+    lengths, mutations = parse_csv_lines(buffer)
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets, mutations
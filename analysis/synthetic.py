@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def synthetic_haplotypes(
+    num_haplotypes,
+    genome_size,
+    ancestral_mutations,
+    branch_mutations,
+    rng,
+):
+    # a random genealogy: every haplotype copies an earlier one and adds a
+    # poisson number of new mutations, so mutation lists stay in the
+    # chronological order the simulator writes them in
+    parents = np.zeros(num_haplotypes, dtype=np.int64)
+    parents[1:] = rng.integers(np.arange(1, num_haplotypes))
+    new_counts = rng.poisson(branch_mutations, size=num_haplotypes)
+    new_counts[0] = ancestral_mutations
+
+    haplotypes = []
+    for haplotype in range(num_haplotypes):
+        new = rng.integers(
+            genome_size + 1, size=new_counts[haplotype], dtype=np.int32
+        )
+        if haplotype == 0:
+            haplotypes.append(new)
+        else:
+            haplotypes.append(
+                np.concatenate([haplotypes[parents[haplotype]], new])
+            )
+
+    return haplotypes
+
+
+def clone_counts(num_individuals, num_haplotypes, clonality, rng):
+    # power law clone sizes: a few large clones and a long tail of rare
+    # haplotypes; every haplotype is carried by at least one individual
+    weights = np.arange(1, num_haplotypes + 1, dtype=float) ** -clonality
+    rng.shuffle(weights)
+    counts = np.ones(num_haplotypes, dtype=np.int64)
+    counts += rng.multinomial(
+        num_individuals - num_haplotypes, weights / weights.sum()
+    )
+    return counts
+
+
+def synthetic_population(
+    carrying_capacity=100_000,
+    genome_size=2_800_000,
+    num_haplotypes=2_000,
+    ancestral_mutations=3_000,
+    branch_mutations=2,
+    clonality=1.2,
+    seed=0,
+):
+    # returns (offsets, mutations) for carrying_capacity individuals in
+    # random order, the table Population builds from a population file
+    rng = np.random.default_rng(seed)
+    num_haplotypes = min(num_haplotypes, carrying_capacity)
+    haplotypes = synthetic_haplotypes(
+        num_haplotypes, genome_size, ancestral_mutations, branch_mutations, rng
+    )
+    counts = clone_counts(carrying_capacity, num_haplotypes, clonality, rng)
+    individuals = rng.permutation(np.repeat(np.arange(num_haplotypes), counts))
+
+    lengths = np.array([len(h) for h in haplotypes], dtype=np.int64)
+    offsets = np.zeros(carrying_capacity + 1, dtype=np.int64)
+    np.cumsum(lengths[individuals], out=offsets[1:])
+    mutations = np.concatenate([haplotypes[h] for h in individuals.tolist()])
+
+    return offsets, mutations
+
+
+def write_population_csv(population_csv_file, offsets, mutations):
+    # the simulator's format: every mutation followed by a comma
+    bounds = offsets.tolist()
+    lines = {}
+    with open(population_csv_file, "w") as file:
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            genome = mutations[start:end]
+            key = genome.tobytes()
+            if key not in lines:
+                lines[key] = "".join(f"{m}," for m in genome.tolist()) + "\n"
+            file.write(lines[key])
+
@@ -43,3 +43,97 @@ class TestAnalysis:
 
         proportions = calc_proportions(analysis.results)
         assert len(proportions) == 1
+
+    def test_combination_calls(self, analysis):
+        import numpy as np
+
+        from ..PairMetrics import PairMetrics
+        from ..Tree import Tree
+
+        analysis.combination_number = 3
+        analysis.perform_analysis()
+        assert len(analysis.results) == 10_000
+
+        metrics = PairMetrics.initialized(
+            analysis.source_pop, analysis.recipient_pop, analysis.num_bins
+        )
+        generator = np.random.default_rng(0)
+        sources = generator.integers(2, size=(50, 3))
+        recipients = generator.integers(2, size=(50, 3))
+        calls = analysis.combination_calls(metrics, sources, recipients)
+        for row in range(50):
+            trees = [
+                Tree.initialized(
+                    analysis.source_pop.sample[source],
+                    analysis.recipient_pop.sample[recipient],
+                    analysis.source_pop,
+                    analysis.recipient_pop,
+                )
+                for source, recipient in zip(sources[row], recipients[row])
+            ]
+            assert calls[0][row] == analysis.collect_tier_1(trees)
+            assert calls[1][row] == analysis.collect_tier_2(trees)
+            assert calls[2][row] == \
+                analysis.collect_clumpiness_composite(trees)
+
+    @pytest.mark.parametrize("k", [2, 3])
+    def test_exact_combination_calls(self, analysis, k):
+        import itertools
+
+        import numpy as np
+
+        from ..PairMetrics import PairMetrics
+
+        # every combination of k of the 4 pairs, each equally likely
+        metrics = PairMetrics.initialized(
+            analysis.source_pop, analysis.recipient_pop, analysis.num_bins
+        )
+        combinations = np.array(
+            list(itertools.product(range(4), repeat=k))
+        )
+        calls = analysis.combination_calls(
+            metrics, combinations // 2, combinations % 2
+        )
+
+        analysis.combination_number = k
+        expected = analysis.expected_combination_calls(metrics)
+        for stat_calls, probabilities in zip(calls, expected):
+            assert np.allclose(
+                np.bincount(stat_calls + 1, minlength=3) / len(combinations),
+                probabilities,
+            )
+
+        analysis.combination_mode = "exact"
+        analysis.perform_analysis()
+        assert len(analysis.results) == 10_000
+        assert calc_proportions(analysis.results)["tier 1 correct"][0] == \
+            pytest.approx(expected[0][2])
+
+    def test_call_probabilities(self):
+        import itertools
+
+        import numpy as np
+
+        from ..Analysis import max_call_probabilities, sum_call_probabilities
+
+        generator = np.random.default_rng(4)
+        source = generator.integers(4, size=(3, 2))
+        recipient = generator.integers(4, size=(3, 2))
+        branch_calls = generator.integers(-2, 3, size=(3, 2))
+        pairs = np.arange(6)
+        combinations = np.array(list(itertools.product(pairs, repeat=3)))
+
+        tier_calls = np.sign(
+            source.ravel()[combinations].max(axis=1)
+            - recipient.ravel()[combinations].max(axis=1)
+        )
+        assert np.allclose(
+            max_call_probabilities(source, recipient, 3),
+            np.bincount(tier_calls + 1, minlength=3) / len(combinations),
+        )
+
+        sum_calls = np.sign(branch_calls.ravel()[combinations].sum(axis=1))
+        assert np.allclose(
+            sum_call_probabilities(branch_calls, 3),
+            np.bincount(sum_calls + 1, minlength=3) / len(combinations),
+        )
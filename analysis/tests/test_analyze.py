@@ -0,0 +1,376 @@
+import json
+import random
+
+import pandas as pd
+import pytest
+
+from .. import analyze
+from ..ResultCache import ResultCache
+from ..ResultStore import ResultStore
+from ..analyze import (
+    find_population_files,
+    main,
+    population_timepoint,
+    run_analyses,
+    run_sweep,
+    sweep_configurations,
+    task_seed,
+)
+
+
+class TestAnalyze:
+    @pytest.fixture
+    def sim_files(self, tmp_path):
+        rng = random.Random(11)
+        for rep in range(2):
+            for pop in ("source", "recipient"):
+                path = tmp_path / f"run_1_{pop}_pop_rep_{rep}.csv"
+                with open(path, "w") as file:
+                    for _ in range(20):
+                        mutations = rng.sample(range(1, 40), rng.randint(0, 8))
+                        file.write("".join(f"{m}," for m in mutations) + "\n")
+        return tmp_path
+
+    @pytest.fixture
+    def analysis_params(self, sim_files):
+        return {
+            "path to simulation files": str(sim_files),
+            "analysis repetitions": 3,
+            "sample size": 6,
+            "number bins": 4,
+            "count populations": 0,
+            "combination number": 2,
+        }
+
+    def test_find_population_files(self, sim_files):
+        pairs = find_population_files(str(sim_files))
+        assert len(pairs) == 2
+        for source_pop, recipient_pop in pairs:
+            assert source_pop.replace("source", "recipient") == recipient_pop
+
+    def test_find_timepoint_files(self, tmp_path):
+        for generation in (10, 50, 100):
+            for pop in ("source", "recipient"):
+                (tmp_path / f"run_1_{pop}_pop_rep_0_gen_{generation}.csv") \
+                    .write_text("1,\n")
+        pairs = find_population_files(str(tmp_path))
+        assert [population_timepoint(source) for source, _ in pairs] == \
+            [10, 50, 100]
+        for source_pop, recipient_pop in pairs:
+            assert source_pop.replace("source", "recipient") == recipient_pop
+        assert population_timepoint("run_1_source_pop_rep_0.csv") is None
+
+    def test_task_seed(self):
+        assert task_seed(1, 0, 0) == task_seed(1, 0, 0)
+        assert task_seed(1, 0, 1) != task_seed(1, 1, 0)
+
+    def test_parallel_matches_serial(self, sim_files, analysis_params):
+        pairs = find_population_files(str(sim_files))
+        serial = run_analyses(analysis_params, pairs, seed=5, workers=1)
+        parallel = run_analyses(analysis_params, pairs, seed=5, workers=2)
+        pd.testing.assert_frame_equal(
+            pd.concat(serial), pd.concat(parallel)
+        )
+
+    @pytest.mark.parametrize("batch", [0, 1])
+    def test_sample_only_matches_full(
+        self, sim_files, analysis_params, batch
+    ):
+        pairs = find_population_files(str(sim_files))
+        analysis_params["batch repetitions"] = batch
+        full = run_analyses(analysis_params, pairs, seed=5)
+        analysis_params["sample only"] = 1
+        sample_only = run_analyses(analysis_params, pairs, seed=5)
+        pd.testing.assert_frame_equal(
+            pd.concat(full), pd.concat(sample_only)
+        )
+
+    def test_sweep_configurations(self, analysis_params):
+        assert sweep_configurations(analysis_params) == [analysis_params]
+
+        analysis_params["number bins"] = [2, 4]
+        analysis_params["combination number"] = [1, 2]
+        configurations = sweep_configurations(analysis_params)
+        assert [
+            (config["number bins"], config["combination number"])
+            for config in configurations
+        ] == [(2, 1), (2, 2), (4, 1), (4, 2)]
+        assert all(config["sample size"] == 6 for config in configurations)
+
+    def test_sweep_matches_single_runs(self, sim_files, analysis_params):
+        pairs = find_population_files(str(sim_files))
+        analysis_params["sample size"] = [4, 6]
+        analysis_params["number bins"] = [2, 4]
+        analysis_params["combination number"] = [1, 2]
+        configurations = sweep_configurations(analysis_params)
+
+        swept = run_sweep(configurations, pairs, seed=5, workers=2)
+        for config, config_proportions in zip(configurations, swept):
+            pd.testing.assert_frame_equal(
+                pd.concat(config_proportions),
+                pd.concat(run_analyses(config, pairs, seed=5)),
+            )
+
+    def test_batch_repetitions(self, sim_files, analysis_params):
+        pairs = find_population_files(str(sim_files))
+        analysis_params["batch repetitions"] = 1
+        serial = run_analyses(analysis_params, pairs, seed=5, workers=1)
+        parallel = run_analyses(analysis_params, pairs, seed=5, workers=2)
+        pd.testing.assert_frame_equal(
+            pd.concat(serial), pd.concat(parallel)
+        )
+
+        analysis_params["number bins"] = [2, 4]
+        configurations = sweep_configurations(analysis_params)
+        swept = run_sweep(configurations, pairs, seed=5)
+        pd.testing.assert_frame_equal(
+            pd.concat(swept[1]), pd.concat(serial)
+        )
+
+    def test_resume_from_cache(
+        self, sim_files, analysis_params, tmp_path, monkeypatch
+    ):
+        pairs = find_population_files(str(sim_files))
+        expected = run_analyses(analysis_params, pairs, seed=5)
+
+        cache = ResultCache(str(tmp_path / "cache"))
+        first = run_analyses(
+            analysis_params, pairs[:1], seed=5, result_cache=cache
+        )
+        pd.testing.assert_frame_equal(first[0], expected[0])
+
+        # a rerun only analyzes the simulation that did not finish
+        analyzed = []
+        original = analyze.analyze_repetition
+
+        def counting(params, source_pop, *args):
+            analyzed.append(source_pop)
+            return original(params, source_pop, *args)
+
+        monkeypatch.setattr(analyze, "analyze_repetition", counting)
+        resumed = run_analyses(
+            analysis_params, pairs, seed=5, result_cache=cache
+        )
+        assert set(analyzed) == {pairs[1][0]}
+        pd.testing.assert_frame_equal(
+            pd.concat(resumed), pd.concat(expected)
+        )
+
+    def test_main(self, sim_files, analysis_params, tmp_path, monkeypatch):
+        sim_params = {
+            "run_id": 1,
+            "source generations": 10,
+            "recipient generations": 5,
+            "bottleneck": 1,
+        }
+        sim_params_file = tmp_path / "sim_params.json"
+        sim_params_file.write_text(json.dumps(sim_params))
+        analysis_params["path to simulation parameters"] = \
+            str(sim_params_file)
+        analysis_params_file = tmp_path / "analysis_params.json"
+        analysis_params_file.write_text(json.dumps(analysis_params))
+
+        monkeypatch.chdir(tmp_path)
+        main([str(analysis_params_file), "--seed", "3"])
+        with open("src10-rec5-bot1-cmb2.json") as file:
+            records = json.load(file)
+
+        assert len(records) == 2
+        assert records[0]["tier 1 correct"] + records[0]["tier 1 reverse"] \
+            + records[0]["tier 1 ambiguous"] == pytest.approx(1)
+        assert records[1]["bottleneck"] == 1
+        assert records[1]["recipient population file"].endswith(
+            "run_1_recipient_pop_rep_1.csv"
+        )
+
+    def test_main_workers(
+        self, sim_files, analysis_params, tmp_path, monkeypatch
+    ):
+        sim_params_file = tmp_path / "sim_params.json"
+        sim_params_file.write_text(json.dumps({
+            "source generations": 10,
+            "recipient generations": 5,
+            "bottleneck": 1,
+        }))
+        analysis_params["path to simulation parameters"] = \
+            str(sim_params_file)
+        analysis_params["workers"] = 3
+        analysis_params_file = tmp_path / "analysis_params.json"
+        analysis_params_file.write_text(json.dumps(analysis_params))
+
+        used = []
+        original = analyze.run_sweep
+
+        def recording(configurations, pairs, seed, workers, *args):
+            used.append(workers)
+            return original(configurations, pairs, seed, 1, *args)
+
+        monkeypatch.setattr(analyze, "run_sweep", recording)
+        monkeypatch.setattr(analyze.os, "cpu_count", lambda: 2)
+        monkeypatch.chdir(tmp_path)
+        for workers in ([], ["--workers", "1"], ["--workers", "0"]):
+            main([str(analysis_params_file), "--seed", "3"] + workers)
+        # an explicit 0 is one per core rather than the params file's value
+        assert used == [3, 1, 2]
+
+    def test_main_store(
+        self, sim_files, analysis_params, tmp_path, monkeypatch
+    ):
+        sim_params_file = tmp_path / "sim_params.json"
+        sim_params_file.write_text(json.dumps({
+            "source generations": 10,
+            "recipient generations": 5,
+            "bottleneck": 1,
+        }))
+        analysis_params["path to simulation parameters"] = \
+            str(sim_params_file)
+        analysis_params["number bins"] = [2, 4]
+        analysis_params_file = tmp_path / "analysis_params.json"
+        analysis_params_file.write_text(json.dumps(analysis_params))
+        store_path = str(tmp_path / "results.sqlite")
+
+        monkeypatch.chdir(tmp_path)
+        main([str(analysis_params_file), "--seed", "3"])
+        main([
+            str(analysis_params_file), "--seed", "3", "--store", store_path
+        ])
+        expected = pd.read_json("src10-rec5-bot1-cmb2.json")
+
+        store = ResultStore(store_path)
+        assert len(store.runs()) == 2
+        records = store.load({"number bins": 4})
+        assert list(records["recipient population file"]) == [
+            recipient for _, recipient in find_population_files(
+                str(sim_files)
+            )
+        ]
+        assert list(records["tier 1 correct"]) == list(
+            expected[expected["number bins"] == 4]["tier 1 correct"]
+        )
+
+    def test_main_timepoints(
+        self, sim_files, analysis_params, tmp_path, monkeypatch
+    ):
+        # 2 repetitions x 2 timepoints, more rows than sampling generations
+        for path in sim_files.glob("run_1_*.csv"):
+            text = path.read_text()
+            for generation in (10, 20):
+                path.with_name(f"{path.stem}_gen_{generation}.csv") \
+                    .write_text(text)
+            path.unlink()
+        sim_params_file = tmp_path / "sim_params.json"
+        sim_params_file.write_text(json.dumps({
+            "source generations": 10,
+            "sampling generations": [10, 20],
+            "bottleneck": 1,
+        }))
+        analysis_params["path to simulation parameters"] = \
+            str(sim_params_file)
+        analysis_params_file = tmp_path / "analysis_params.json"
+        analysis_params_file.write_text(json.dumps(analysis_params))
+
+        monkeypatch.chdir(tmp_path)
+        main([str(analysis_params_file), "--seed", "3"])
+        records = pd.read_json("src10-rec10_20-bot1-cmb2.json")
+
+        assert list(records["recipient generations"]) == [10, 10, 20, 20]
+        assert all(
+            generations == [10, 20]
+            for generations in records["sampling generations"]
+        )
+
+    def test_main_sweep(
+        self, sim_files, analysis_params, tmp_path, monkeypatch
+    ):
+        sim_params_file = tmp_path / "sim_params.json"
+        sim_params_file.write_text(json.dumps({
+            "source generations": 10,
+            "recipient generations": 5,
+            "bottleneck": 1,
+        }))
+        analysis_params["path to simulation parameters"] = \
+            str(sim_params_file)
+        analysis_params["number bins"] = [2, 4]
+        analysis_params["combination number"] = [1, 2]
+        analysis_params_file = tmp_path / "analysis_params.json"
+        analysis_params_file.write_text(json.dumps(analysis_params))
+
+        monkeypatch.chdir(tmp_path)
+        main([str(analysis_params_file), "--seed", "3"])
+        records = pd.read_json("src10-rec5-bot1-cmb1_2.json")
+
+        assert len(records) == 4 * 2
+        assert sorted(
+            records.groupby(["number bins", "combination number"]).size()
+        ) == [2, 2, 2, 2]
+
+    def test_profile(self, sim_files, analysis_params, tmp_path):
+        from ..Population import Population
+        from ..Profiler import Profiler
+
+        pairs = find_population_files(str(sim_files))
+        original = Population.__dict__["get_sample_snps"]
+        profiler = Profiler()
+        run_analyses(analysis_params, pairs, seed=5, profiler=profiler)
+        assert Population.__dict__["get_sample_snps"] is original
+
+        stages = profiler.stages
+        assert stages["get sample snps"]["calls"] >= 2 * 2 * 3
+        assert stages["pair metrics initialized"]["calls"] == 2 * 3
+        assert stages["collect results"]["seconds"] > 0
+        assert profiler.counters["trees"] == 2 * 3 * 10_000 * 2
+        # memory is a process high-water mark, reported once
+        assert "peak rss bytes" not in stages["get sample snps"]
+        assert profiler.peak_rss_bytes > 0
+
+        parallel = Profiler()
+        run_analyses(
+            analysis_params, pairs, seed=5, workers=2, profiler=parallel
+        )
+        # workers load their own populations, so only the analyses match
+        assert parallel.stages["pair metrics initialized"]["calls"] == 2 * 3
+        assert parallel.counters["trees"] == profiler.counters["trees"]
+        assert parallel.peak_rss_bytes > 0
+
+        profile_file = tmp_path / "results.profile.json"
+        profiler.write(profile_file, wall_seconds=2.0)
+        with open(profile_file) as file:
+            summary = json.load(file)
+        assert summary["trees per second"] == summary["trees"] / 2
+        assert summary["peak rss bytes"] > 0
+
+    def test_profile_store(
+        self, sim_files, analysis_params, tmp_path, monkeypatch
+    ):
+        sim_params_file = tmp_path / "sim_params.json"
+        sim_params_file.write_text(json.dumps({
+            "source generations": 10,
+            "recipient generations": 5,
+            "bottleneck": 1,
+        }))
+        analysis_params["path to simulation parameters"] = \
+            str(sim_params_file)
+        analysis_params_file = tmp_path / "analysis_params.json"
+        analysis_params_file.write_text(json.dumps(analysis_params))
+        store_dir = tmp_path / "store"
+        store_dir.mkdir()
+
+        monkeypatch.chdir(tmp_path)
+        main([
+            str(analysis_params_file), "--seed", "3", "--profile",
+            "--store", str(store_dir / "results.sqlite"),
+        ])
+        assert (store_dir / "src10-rec5-bot1-cmb2.profile.json").exists()
+        assert not (tmp_path / "src10-rec5-bot1-cmb2.profile.json").exists()
+
+    def test_profile_haplotypes(self, tmp_path, analysis_params):
+        from ..Profiler import Profiler
+
+        for pop in ("source", "recipient"):
+            (tmp_path / f"run_1_{pop}_pop_rep_0.hap").write_text(
+                "6:1,2,\n4:3,\n2:1,4,\n"
+            )
+        pairs = find_population_files(str(tmp_path))
+        profiler = Profiler()
+        run_analyses(analysis_params, pairs, seed=5, profiler=profiler)
+        assert profiler.stages["parse haplotypes"]["calls"] == 2
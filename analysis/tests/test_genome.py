@@ -1,4 +1,5 @@
 from ..Genome import Genome
+from ..Population import Population
 
 
 class TestGenome:
@@ -18,3 +19,8 @@ class TestGenome:
         ]
         assert not g1.is_unique_in_population(pop)
         assert g2.is_unique_in_population(pop)
+
+        population = Population.from_genomes(pop, sample_size=0)
+        assert not g1.is_unique_in_population(population)
+        assert g2.is_unique_in_population(population)
+        assert Genome([4, 3, 2, 1]).haplotype_key() == g1.haplotype_key()
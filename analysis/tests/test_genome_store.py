@@ -0,0 +1,53 @@
+import numpy as np
+
+from ..Genome import Genome
+from ..GenomeStore import GenomeStore
+
+
+class TestGenomeStore:
+    def test_from_table(self):
+        offsets = np.array([0, 3, 3, 5])
+        mutations = np.array([30, 10, 20, 7, 5], dtype=np.int32)
+        store = GenomeStore.from_table(offsets, mutations)
+
+        assert len(store) == 3
+        assert store.mutations.tolist() == [10, 20, 30, 5, 7]
+        assert [list(g.mutations) for g in store.genomes()] == \
+            [[10, 20, 30], [], [5, 7]]
+        assert store.row_keys()[0] == Genome([30, 20, 10]).haplotype_key()
+
+    def test_genomes_are_views(self):
+        store = GenomeStore.from_genomes([Genome([2, 1]), Genome([3])])
+        genomes = store.genomes()
+        assert np.shares_memory(genomes[0].mutations, store.mutations)
+        assert genomes[0] == Genome([1, 2])
+
+    def test_take(self):
+        store = GenomeStore.from_genomes(
+            [Genome([1, 2]), Genome([3]), Genome([4, 5, 6])]
+        )
+        taken = store.take([2, 0])
+        assert taken.offsets.tolist() == [0, 3, 5]
+        assert taken.mutations.tolist() == [4, 5, 6, 1, 2]
+
+    def test_unsorted(self):
+        offsets = np.array([0, 2, 4, 6])
+        mutations = np.array([2, 1, 2, 1, 1, 2], dtype=np.int32)
+        table = GenomeStore.unsorted(offsets, mutations)
+
+        # rows match as written until sorted
+        keys = table.row_keys()
+        assert keys[0] == keys[1] != keys[2]
+        assert len(set(table.sorted().row_keys())) == 1
+
+    def test_is_sorted(self):
+        offsets = np.array([0, 0, 2, 3, 3, 5, 5])
+        mutations = np.array([1, 4, 2, 3, 9], dtype=np.int32)
+        table = GenomeStore.unsorted(offsets, mutations)
+        assert table.is_sorted()
+        assert table.is_sorted(chunk_rows=2)
+        assert table.sorted() is table
+
+        mutations[3:] = [9, 3]
+        assert not table.is_sorted(chunk_rows=2)
+        assert table.sorted().mutations.tolist() == [1, 4, 2, 3, 9]
@@ -0,0 +1,118 @@
+import random
+
+import numpy as np
+import pytest
+
+from ..Analysis import Analysis
+from ..Genome import Genome
+from ..PairMetrics import PairMetrics
+from ..Population import Population
+from ..Tree import Tree
+
+
+class TestPairMetrics:
+    @pytest.fixture
+    def populations(self):
+        rng = random.Random(7)
+        ancestor = list(range(1, 30))
+
+        def genomes():
+            return [
+                Genome(
+                    rng.sample(ancestor, rng.randint(0, 20))
+                    + [rng.randint(30, 60) for _ in range(rng.randint(0, 4))]
+                )
+                for _ in range(8)
+            ]
+
+        source_pop = Population()
+        source_pop.sample = genomes()
+        source_pop.sample.append(Genome([]))
+        source_pop.get_sample_snps()
+        recipient_pop = Population()
+        recipient_pop.sample = genomes()
+        recipient_pop.get_sample_snps()
+        return source_pop, recipient_pop
+
+    def test_matches_tree(self, populations):
+        source_pop, recipient_pop = populations
+        metrics = PairMetrics.initialized(source_pop, recipient_pop, 5)
+        tier_1 = metrics.check_tier_1()
+        tier_2 = metrics.check_tier_2()
+        clumpiness = metrics.check_clumpiness_composite()
+
+        for i, source_genome in enumerate(source_pop.sample):
+            for j, recipient_genome in enumerate(recipient_pop.sample):
+                tree = Tree.initialized(
+                    source_genome, recipient_genome, source_pop, recipient_pop
+                )
+                for stat, value in tree.check_tier_1().items():
+                    assert tier_1[stat][i, j] == value
+                for stat, value in tree.check_tier_2().items():
+                    assert tier_2[stat][i, j] == value
+
+                expected = tree.check_clumpiness_composite(5)
+                src_lineage = expected["ancestral to source lineage"]
+                rec_lineage = expected["ancestral to recipient lineage"]
+                for population in ("source", "recipient"):
+                    assert (
+                        clumpiness["ancestral to source lineage"]
+                        [population][i]
+                        == src_lineage[population]
+                    )
+                    assert (
+                        clumpiness["ancestral to recipient lineage"]
+                        [population][j]
+                        == rec_lineage[population]
+                    )
+
+    def test_calls_match_tree_loop(self, populations):
+        source_pop, recipient_pop = populations
+        analysis = Analysis()
+        analysis.source_pop = source_pop
+        analysis.recipient_pop = recipient_pop
+        analysis.num_bins = 5
+        analysis.combination_number = 1
+        analysis.perform_analysis()
+
+        expected = []
+        for source_genome in source_pop.sample:
+            for recipient_genome in recipient_pop.sample:
+                trees = [
+                    Tree.initialized(
+                        source_genome,
+                        recipient_genome,
+                        source_pop,
+                        recipient_pop,
+                    )
+                ]
+                expected.append((
+                    analysis.collect_tier_1(trees),
+                    analysis.collect_tier_2(trees),
+                    analysis.collect_clumpiness_composite(trees),
+                ))
+
+        assert list(zip(
+            analysis.results["tier 1"],
+            analysis.results["tier 2"],
+            analysis.results["clumpiness"],
+        )) == expected
+
+    def test_no_bins(self, populations):
+        source_pop, recipient_pop = populations
+        metrics = PairMetrics.initialized(source_pop, recipient_pop, 0)
+        assert not metrics.clumpiness_calls().any()
+
+    def test_with_num_bins(self, populations):
+        source_pop, recipient_pop = populations
+        metrics = PairMetrics.initialized(source_pop, recipient_pop, 4)
+        tier_1 = metrics.check_tier_1()
+        rebinned = metrics.with_num_bins(2)
+
+        assert rebinned.check_tier_1() is tier_1
+        np.testing.assert_array_equal(
+            rebinned.clumpiness_calls(),
+            PairMetrics.initialized(
+                source_pop, recipient_pop, 2
+            ).clumpiness_calls(),
+        )
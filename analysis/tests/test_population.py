@@ -14,7 +14,47 @@ class TestPopulation:
         assert len(pop.population) == 4
         assert len(pop.population[0].mutations) == 5
         assert len(pop.population[2].mutations) == 0
-        assert pop.population[1].mutations == [4600, 300500, 13]
+        assert list(pop.population[1].mutations) == [13, 4600, 300500]
+        assert pop.genome_offsets.tolist() == [0, 5, 8, 8, 9]
+
+    def test_from_file_detects_binary(self, tmp_path):
+        from ..population_io import read_csv_table, write_binary_table
+
+        path = tmp_path / "test_file.bin"
+        write_binary_table(path, *read_csv_table("test_file.csv"))
+        pop = Population.from_file(str(path), sample_size=2)
+        assert len(pop.population) == 4
+        assert list(pop.population[1].mutations) == [13, 4600, 300500]
+        assert pop.file_header["genome count"] == 4
+        assert len(pop.sample) == 2
+
+        pop = Population.from_file("test_file.csv", sample_size=0)
+        assert pop.file_header is None
+        assert len(pop.population) == 4
+
+    def test_binary_without_clones_is_not_copied(self, tmp_path):
+        import numpy as np
+
+        from ..population_io import write_binary_table
+
+        path = tmp_path / "sorted.bin"
+        write_binary_table(
+            path, np.array([0, 2, 2, 5]),
+            np.array([1, 4, 2, 3, 9], dtype=np.int32),
+        )
+        pop = Population.from_file(str(path), sample_size=0)
+        assert isinstance(pop.genome_mutations.base, np.memmap)
+        assert list(pop.population[2].mutations) == [2, 3, 9]
+
+        # a clone or an unsorted row is copied and sorted
+        write_binary_table(
+            path, np.array([0, 2, 4, 7]),
+            np.array([1, 4, 1, 4, 9, 3, 2], dtype=np.int32),
+        )
+        pop = Population.from_file(str(path), sample_size=0)
+        assert not isinstance(pop.genome_mutations.base, np.memmap)
+        assert pop.haplotype_counts.tolist() == [2, 1]
+        assert list(pop.population[2].mutations) == [2, 3, 9]
 
     def test_population_from_genomes(self):
         genomes = [
@@ -36,6 +76,170 @@ class TestPopulation:
         pop = Population.from_csv_file("test_file.csv", sample_size=0)
         assert len(pop.sample) == 0
 
+    def test_intern_haplotypes(self, tmp_path):
+        path = tmp_path / "clones.csv"
+        path.write_text("3,1,2,\n1,2,3,\n\n4,\n2,3,1,\n\n")
+        pop = Population.from_csv_file(str(path), sample_size=0)
+        assert len(pop.population) == 6
+        assert len(pop.haplotypes) == 3
+        assert pop.haplotype_counts.tolist() == [3, 2, 1]
+        assert pop.haplotype_of.tolist() == [0, 0, 1, 2, 0, 1]
+        assert pop.genome_offsets.tolist() == [0, 3, 3, 4]
+        assert pop.population[1] is pop.population[4]
+        assert pop.count_haplotype(Genome([2, 1, 3])) == 3
+        assert pop.count_haplotype(Genome([5])) == 0
+
+        genomes = [Genome([1, 2]), Genome([2, 1]), Genome([])]
+        pop = Population.from_genomes(genomes, sample_size=0)
+        assert pop.haplotype_counts.tolist() == [2, 1]
+        assert pop.population[1] is genomes[0]
+
+    def test_sample_haplotypes(self):
+        import random
+
+        genomes = [Genome([i % 3]) for i in range(30)]
+        random.seed(3)
+        expected = random.sample(genomes, 10)
+        random.seed(3)
+        pop = Population.from_genomes(genomes, sample_size=10)
+        assert pop.sample == expected
+
+        pop = Population.from_genomes(genomes[:2], sample_size=5)
+        assert len(pop.sample) == 5
+        assert all(genome in genomes[:2] for genome in pop.sample)
+
+    def test_resample(self):
+        import random
+
+        pop = Population.from_csv_file("test_file.csv", sample_size=0)
+        resampled = pop.resample(3, random.Random(1))
+        assert len(resampled.sample) == 3
+        assert resampled.haplotypes is pop.haplotypes
+        assert len(pop.sample) == 0
+        assert len(pop.sample_snps) == 0
+        assert sum(
+            resampled.sample_snps[snp]["count"]
+            for snp in resampled.sample_snps
+        ) == sum(len(genome.mutations) for genome in resampled.sample)
+
+    def test_from_file_sample(self, tmp_path):
+        import random
+
+        from ..population_io import read_csv_table, write_binary_table
+
+        path = tmp_path / "sample.csv"
+        path.write_text("".join(f"{i},{i + 1},\n" for i in range(50)))
+        full = Population.from_file(str(path), 10, random.Random(4))
+        indexed = Population.from_file_sample(
+            str(path), 10, random.Random(4)
+        )
+        assert indexed.sample == full.sample
+        assert indexed.population == []
+        assert indexed.sample_snps == full.sample_snps
+
+        binary_path = tmp_path / "sample.bin"
+        write_binary_table(binary_path, *read_csv_table(path))
+        binary = Population.from_file_sample(
+            str(binary_path), 10, random.Random(4)
+        )
+        assert binary.sample == full.sample
+
+        streamed = Population.from_file_sample(
+            str(path), 10, random.Random(4), use_line_index=False
+        )
+        assert len(streamed.sample) == 10
+        assert len(set(g.haplotype_key() for g in streamed.sample)) == 10
+
+        resampled = indexed.resample(60, random.Random(1))
+        assert len(resampled.sample) == 60
+
+    def test_resample_batch(self, tmp_path):
+        import numpy as np
+
+        from ..SnpTable import SnpTable
+
+        path = tmp_path / "batch.csv"
+        path.write_text(
+            "".join(f"{i % 7},{i % 3 + 10},{i % 7},\n" for i in range(400))
+        )
+        generator = np.random.default_rng(2)
+        for pop in (
+            Population.from_csv_file(str(path), sample_size=0),
+            Population.from_genomes(
+                Population.from_csv_file(str(path), 0).population, 0
+            ),
+        ):
+            for sample_size in (5, 30, 500):
+                samples = pop.resample_batch(20, sample_size, generator)
+                assert len(samples) == 20
+                for sample in samples:
+                    assert len(sample.sample) == sample_size
+                    assert sample.haplotypes is pop.haplotypes
+                    assert sample.sample_snps == \
+                        SnpTable.from_genomes(sample.sample)
+
+        sample = pop.resample_batch(1, 5, generator)[0]
+        matrix = sample.draw_sample_matrix(200, generator)
+        assert all(len(set(row)) == 5 for row in matrix.tolist())
+
+    def test_resample_batch_sample_only(self, tmp_path):
+        import numpy as np
+
+        from ..population_io import read_csv_table, write_binary_table
+
+        path = tmp_path / "batch.csv"
+        path.write_text(
+            "".join(f"{i % 7},{i % 3 + 10},\n" for i in range(50))
+        )
+        write_binary_table(str(path) + ".bin", *read_csv_table(str(path)))
+
+        # the same individuals as a parsed population for the same stream
+        full = Population.from_csv_file(str(path), sample_size=0)
+        for sample_only in (
+            Population.from_file_sample(str(path), sample_size=0),
+            Population.from_file_sample(str(path) + ".bin", sample_size=0),
+        ):
+            for sample_size in (5, 60):
+                expected = full.resample_batch(
+                    4, sample_size, np.random.default_rng(8)
+                )
+                samples = sample_only.resample_batch(
+                    4, sample_size, np.random.default_rng(8)
+                )
+                for sample, full_sample in zip(samples, expected):
+                    assert sample.sample == full_sample.sample
+                    assert sample.sample_snps == full_sample.sample_snps
+
+    def test_from_haplotype_file(self, tmp_path):
+        import random
+
+        import numpy as np
+
+        from ..SnpTable import SnpTable
+
+        path = tmp_path / "pop.hap"
+        path.write_text("3:5,1,\n1:\n2:1,5,\n4:9,\n")
+        pop = Population.from_file(str(path), 4, random.Random(3))
+        assert len(pop.haplotypes) == 3  # rows 0 and 2 are one haplotype
+        assert pop.haplotype_counts.tolist() == [5, 1, 4]
+        assert len(pop.population) == 10
+        assert pop.population[5] is pop.haplotypes[1]
+        assert pop.population[-1] is pop.haplotypes[2]
+        assert list(pop.population) == pop.population[:]
+        assert pop.haplotypes[1].is_unique_in_population(pop.population)
+        assert not pop.haplotypes[0].is_unique_in_population(pop.population)
+        assert pop.num_individuals() == 10
+        assert pop.haplotypes_of([0, 4, 5, 6, 9]).tolist() == [0, 0, 1, 2, 2]
+        assert pop.count_haplotype(Genome([5, 1])) == 5
+        assert pop.sample_snps == SnpTable.from_genomes(pop.sample)
+
+        # the whole population: every individual drawn once
+        everyone = pop.resample(10)
+        assert sorted(len(g.mutations) for g in everyone.sample) == \
+            [0] + [1] * 4 + [2] * 5
+        for sample in pop.resample_batch(5, 10, np.random.default_rng(1)):
+            assert sample.sample_snps == everyone.sample_snps
+
     def test_get_sample_snps(self):
         pop = Population()
         sample = [
@@ -0,0 +1,31 @@
+import os
+
+from ..PopulationCache import PopulationCache
+
+
+class TestPopulationCache:
+    def test_get(self, tmp_path):
+        paths = []
+        for name in ("a.csv", "b.csv", "c.csv"):
+            path = tmp_path / name
+            path.write_text("1,2,\n3,\n")
+            paths.append(str(path))
+
+        cache = PopulationCache(max_size=2)
+        pop = cache.get(paths[0])
+        assert len(pop.population) == 2
+        assert cache.get(paths[0]) is pop
+
+        cache.get(paths[1])
+        cache.get(paths[0])
+        cache.get(paths[2])  # evicts b, the least recently used
+        assert len(cache.populations) == 2
+        assert cache.get(paths[0]) is pop
+
+        with open(paths[0], "a") as file:
+            file.write("4,\n")
+        stat = os.stat(paths[0])
+        os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        reloaded = cache.get(paths[0])
+        assert reloaded is not pop
+        assert len(reloaded.population) == 3
@@ -0,0 +1,164 @@
+import pytest
+
+import random
+
+import numpy as np
+
+from ..population_io import (
+    index_csv_lines,
+    is_binary_file,
+    is_haplotype_file,
+    line_index,
+    line_index_file,
+    load_line_index,
+    read_binary_table,
+    read_csv_lines,
+    read_csv_table,
+    read_haplotype_table,
+    read_mutation_table,
+    reservoir_sample_lines,
+    write_binary_table,
+    write_haplotype_table,
+)
+
+
+class TestPopulationIO:
+    @pytest.fixture
+    def csv_file(self, tmp_path):
+        path = tmp_path / "pop.csv"
+        path.write_text(
+            "200,12345,2700000,3,0,\n"
+            "4600,300500,13,\n"
+            "\n"
+            "7,\n"
+            "\n"
+            "8,9"
+        )
+        return path
+
+    def test_read_csv_table(self, csv_file):
+        offsets, mutations = read_csv_table(csv_file)
+        assert offsets.tolist() == [0, 5, 8, 8, 9, 9, 11]
+        assert mutations.tolist() == [
+            200, 12345, 2700000, 3, 0, 4600, 300500, 13, 7, 8, 9
+        ]
+        assert mutations.dtype == "int32"
+
+    def test_chunk_boundaries(self, csv_file):
+        expected = read_csv_table(csv_file)
+        for chunk_size in (1, 2, 3, 7, 16):
+            offsets, mutations = read_csv_table(csv_file, chunk_size)
+            assert offsets.tolist() == expected[0].tolist()
+            assert mutations.tolist() == expected[1].tolist()
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.csv"
+        path.write_text("")
+        offsets, mutations = read_csv_table(path)
+        assert offsets.tolist() == [0]
+        assert len(mutations) == 0
+
+        path.write_text("\n\n")
+        offsets, mutations = read_csv_table(path)
+        assert offsets.tolist() == [0, 0, 0]
+
+    def test_binary_round_trip(self, csv_file, tmp_path):
+        offsets, mutations = read_csv_table(csv_file)
+        path = tmp_path / "pop.bin"
+        write_binary_table(
+            path, offsets, mutations, genome_size=2800000, run_id=4
+        )
+        assert is_binary_file(path)
+        assert not is_binary_file(csv_file)
+
+        binary_offsets, binary_mutations, header = read_binary_table(path)
+        assert isinstance(binary_mutations, np.memmap)
+        assert binary_offsets.tolist() == offsets.tolist()
+        assert binary_mutations.tolist() == mutations.tolist()
+        assert header["genome count"] == 6
+        assert header["mutation count"] == 11
+        assert header["genome size"] == 2800000
+        assert header["run id"] == 4
+
+    def test_binary_without_mutations(self, tmp_path):
+        path = tmp_path / "pop.bin"
+        write_binary_table(path, [0, 0, 0], [])
+        offsets, mutations, header = read_binary_table(path)
+        assert offsets.tolist() == [0, 0, 0]
+        assert len(mutations) == 0
+
+    def test_index_csv_lines(self, csv_file):
+        offsets = index_csv_lines(csv_file)
+        assert len(offsets) == 7
+        assert offsets[-1] == csv_file.stat().st_size
+        assert index_csv_lines(csv_file, chunk_size=3).tolist() \
+            == offsets.tolist()
+
+    def test_line_index_sidecar(self, csv_file):
+        assert load_line_index(csv_file) is None
+        offsets = line_index(csv_file)
+        assert load_line_index(csv_file).tolist() == offsets.tolist()
+
+        with open(csv_file, "a") as file:
+            file.write(",10,\n")
+        assert load_line_index(csv_file) is None
+        assert len(line_index(csv_file)) == 7
+        assert line_index_file(csv_file).endswith(".idx")
+
+    def test_unreadable_line_index(self, csv_file, tmp_path):
+        index_file = tmp_path / "pop.csv.idx"
+        for content in (b"", b"\x93NUMPY", None):
+            if content is None:  # a valid file short of any offset
+                with open(index_file, "wb") as file:
+                    np.save(file, np.array([1], dtype=np.int64))
+            else:
+                index_file.write_bytes(content)
+            assert load_line_index(csv_file) is None
+            assert line_index(csv_file).tolist() == \
+                index_csv_lines(csv_file).tolist()
+            assert load_line_index(csv_file) is not None
+        # no temporary index files are left behind
+        assert sorted(path.name for path in tmp_path.iterdir()) == \
+            ["pop.csv", "pop.csv.idx"]
+
+    def test_read_csv_lines(self, csv_file):
+        offsets, mutations = read_csv_lines(
+            csv_file, line_index(csv_file), [5, 1, 2, 1]
+        )
+        assert offsets.tolist() == [0, 2, 5, 5, 8]
+        assert mutations.tolist() == [8, 9, 4600, 300500, 13, 4600, 300500, 13]
+
+        offsets, mutations = read_csv_lines(csv_file, line_index(csv_file), [])
+        assert offsets.tolist() == [0]
+
+    def test_reservoir_sample_lines(self, csv_file):
+        offsets, mutations = \
+            reservoir_sample_lines(csv_file, 4, random.Random(2))
+        assert len(offsets) == 5
+
+        # fewer lines than samples: draw with replacement
+        offsets, mutations = \
+            reservoir_sample_lines(csv_file, 20, random.Random(2))
+        assert len(offsets) == 21
+        assert set(mutations.tolist()) <= set(read_csv_table(csv_file)[1])
+
+    def test_haplotype_table(self, tmp_path):
+        path = tmp_path / "pop.hap"
+        path.write_text("3:5,1,\n1:\n12:7,5,1,9,\n")
+        assert is_haplotype_file(path)
+
+        counts, offsets, mutations = read_haplotype_table(path)
+        assert counts.tolist() == [3, 1, 12]
+        assert offsets.tolist() == [0, 2, 2, 6]
+        assert mutations.tolist() == [5, 1, 7, 5, 1, 9]
+
+        copy = tmp_path / "copy.hap"
+        write_haplotype_table(copy, counts, offsets, mutations)
+        assert copy.read_text() == path.read_text()
+
+    def test_read_mutation_table(self, tmp_path):
+        path = tmp_path / "pop.mut"
+        path.write_text("1,16\n5,15\n")
+        mutations, counts = read_mutation_table(path)
+        assert mutations.tolist() == [1, 5]
+        assert counts.tolist() == [16, 15]
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+from ..ResultCache import ResultCache
+from ..Results import Results
+
+
+class TestResultCache:
+    def test_key(self, tmp_path):
+        source = tmp_path / "run_1_source_pop_rep_0.csv"
+        recipient = tmp_path / "run_1_recipient_pop_rep_0.csv"
+        source.write_text("1,2,\n3,\n")
+        recipient.write_text("1,\n")
+        params = {"sample size": 2, "workers": 1}
+        cache = ResultCache(str(tmp_path / "cache"))
+
+        key = cache.key(params, str(source), str(recipient), 5, 0)
+        assert key == cache.key(
+            {**params, "workers": 4}, str(source), str(recipient), 5, 0
+        )
+        assert key != cache.key(
+            {**params, "sample size": 3}, str(source), str(recipient), 5, 0
+        )
+        assert key != cache.key(params, str(source), str(recipient), 6, 0)
+        assert key != cache.key(params, str(source), str(recipient), 5, 1)
+
+        stat = os.stat(source)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert key != cache.key(params, str(source), str(recipient), 5, 0)
+
+    def test_get_put(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        assert cache.get("missing") is None
+
+        results = Results()
+        results.extend([1, 1, 0], [-1, 0, 0], [1, 1, 1])
+        cache.put("unit", results, source_population_file="a.csv")
+        cached = cache.get("unit")
+        for stat in results.tallies:
+            assert np.array_equal(cached.tallies[stat], results.tallies[stat])
+        assert sorted(os.listdir(tmp_path)) == ["unit.json"]
+
+        # a partially written entry is treated as missing
+        (tmp_path / "broken.json").write_text('{"tallies": ')
+        assert cache.get("broken") is None
+
+    def test_seed(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        assert cache.seed(7) == 7
+        assert cache.seed(8) == 7
@@ -0,0 +1,75 @@
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+
+from ..ResultStore import ResultStore
+
+
+def append_runs(path, first, count):
+    store = ResultStore(path)
+    for run in range(first, first + count):
+        rows = pd.DataFrame({"tier 1 correct": [0.5], "sim": [run]})
+        store.append(rows, {"bottleneck": run % 2})
+    store.close()
+
+
+class TestResultStore:
+    def test_append_load(self, tmp_path):
+        store = ResultStore(str(tmp_path / "results.sqlite"))
+        assert store.load().empty
+
+        rows = pd.DataFrame({
+            "tier 1 correct": [0.25, 0.75],
+            "recipient generations": np.array([10, 20]),
+        })
+        params = {"bottleneck": 1, "recipient generations": 20}
+        run = store.append(rows, params)
+        store.append(rows.assign(extra=[1, 2]), {"bottleneck": 5})
+
+        # parameters once per run, per-row columns only in the rows
+        runs = store.runs()
+        assert list(runs["run"]) == [run, run + 1]
+        assert "recipient generations" not in runs.columns
+
+        results = store.load()
+        assert len(results) == 4
+        assert list(results["bottleneck"]) == [1, 1, 5, 5]
+        assert results["extra"].isna().sum() == 2
+
+        selected = store.load({"bottleneck": 1, "recipient generations": 20})
+        assert list(selected["tier 1 correct"]) == [0.75]
+        assert store.load({"missing": 1}).empty
+        store.close()
+
+    def test_load_list_param(self, tmp_path):
+        store = ResultStore(str(tmp_path / "results.sqlite"))
+        rows = pd.DataFrame({"tier 1 correct": [0.25, 0.75]})
+        store.append(rows, {"sampling generations": [10, 20]})
+        store.append(rows, {"sampling generations": [10]})
+        store.append(rows, {"sampling generations": 10})
+
+        selected = store.load({"sampling generations": [10, 20]})
+        assert list(selected["tier 1 correct"]) == [0.25, 0.75]
+        assert all(
+            generations == [10, 20]
+            for generations in selected["sampling generations"]
+        )
+        assert len(store.load({"sampling generations": [10]})) == 2
+        assert len(store.load({"sampling generations": 10})) == 2
+        assert store.load({"sampling generations": [20]}).empty
+        store.close()
+
+    def test_concurrent_appends(self, tmp_path):
+        path = str(tmp_path / "results.sqlite")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as pool:
+            futures = [
+                pool.submit(append_runs, path, first, 10)
+                for first in range(0, 40, 10)
+            ]
+            for future in futures:
+                future.result()
+
+        results = ResultStore(path).load()
+        assert sorted(results["sim"]) == list(range(40))
+        assert (results["bottleneck"] == results["sim"] % 2).all()
@@ -0,0 +1,43 @@
+import math
+
+from ..Results import Results
+from ..analyze import calc_proportions
+
+
+class TestResults:
+    def test_append_and_extend(self):
+        results = Results()
+        results.append(1, -1, 0)
+        results.extend([1, 0, 0], [1, 1, -1], [0, 0, 0])
+        assert len(results) == 4
+        assert list(results["tier 1"]) == [1, 1, 0, 0]
+        assert list(results["tier 2"]) == [-1, 1, 1, -1]
+        assert results.proportion("tier 1", "correct") == 0.5
+        assert results.proportion("tier 2", "reverse") == 0.5
+        assert results.proportion("clumpiness", "ambiguous") == 1
+
+    def test_growth(self):
+        results = Results(capacity=2)
+        for _ in range(2000):
+            results.append(1, 0, -1)
+        assert len(results) == 2000
+        assert len(results.to_dataframe()) == 2000
+        assert results.proportion("clumpiness", "reverse") == 1
+
+    def test_merge(self):
+        sim_results = Results()
+        for calls in ([1, 1], [-1, 0]):
+            rep_results = Results()
+            rep_results.extend(calls, calls, calls)
+            sim_results.merge(rep_results)
+
+        assert len(sim_results) == sim_results.size == 4
+        assert list(sim_results["tier 1"]) == [1, 1, -1, 0]
+        assert len(sim_results.to_dataframe()) == 4
+        proportions = calc_proportions(sim_results)
+        assert proportions["tier 1 correct"][0] == 0.5
+        assert proportions["tier 2 reverse"][0] == 0.25
+        assert proportions["clumpiness ambiguous"][0] == 0.25
+
+    def test_empty(self):
+        assert math.isnan(Results().proportion("tier 1", "correct"))
@@ -0,0 +1,36 @@
+import pytest
+
+from ..Genome import Genome
+from ..SnpTable import SnpTable
+
+
+class TestSnpTable:
+    @pytest.fixture
+    def snps(self):
+        return SnpTable.from_genomes([
+            Genome([5, 1, 3]),
+            Genome([1, 3]),
+            Genome([1, 9]),
+            Genome([]),
+        ])
+
+    def test_from_genomes(self, snps):
+        assert snps.mutations.tolist() == [1, 3, 5, 9]
+        assert snps.counts.tolist() == [3, 2, 1, 1]
+        assert snps.proportions.tolist() == [0.75, 0.5, 0.25, 0.25]
+        assert len(SnpTable.from_genomes([])) == 0
+
+    def test_batched_lookup(self, snps):
+        assert snps.lookup([9, 2, 1, 10, 0]).tolist() == [3, -1, 0, -1, -1]
+        assert snps.counts_of([3, 4]).tolist() == [2, 0]
+        assert snps.proportions_of([5, 1, 7]).tolist() == [0.25, 0.75, 0]
+        assert len(snps.proportions_of([])) == 0
+        assert SnpTable().proportions_of([1, 2]).tolist() == [0, 0]
+
+    def test_dict_compatibility(self, snps):
+        assert 3 in snps
+        assert 4 not in snps
+        assert list(snps) == [1, 3, 5, 9]
+        assert snps[1] == {"count": 3, "proportion": 0.75}
+        with pytest.raises(KeyError):
+            snps[2]
@@ -0,0 +1,41 @@
+import numpy as np
+
+from ..Population import Population
+from ..synthetic import synthetic_population, write_population_csv
+
+
+class TestSynthetic:
+    def test_synthetic_population(self):
+        offsets, mutations = synthetic_population(
+            carrying_capacity=500,
+            genome_size=1000,
+            num_haplotypes=20,
+            ancestral_mutations=30,
+            branch_mutations=2,
+            seed=1,
+        )
+        assert len(offsets) == 501
+        assert offsets[-1] == len(mutations)
+        assert mutations.max() <= 1000
+        assert np.diff(offsets).min() >= 30
+
+        again = synthetic_population(500, 1000, 20, 30, 2, seed=1)
+        assert np.array_equal(again[0], offsets)
+        assert np.array_equal(again[1], mutations)
+
+    def test_write_population_csv(self, tmp_path):
+        offsets, mutations = synthetic_population(
+            carrying_capacity=300,
+            genome_size=1000,
+            num_haplotypes=10,
+            ancestral_mutations=5,
+            seed=2,
+        )
+        path = tmp_path / "pop.csv"
+        write_population_csv(path, offsets, mutations)
+        assert path.read_text().splitlines()[0].endswith(",")
+
+        pop = Population.from_csv_file(str(path), sample_size=10)
+        assert len(pop.population) == 300
+        assert len(pop.haplotypes) <= 10
+        assert pop.haplotype_counts.sum() == 300
@@ -1,6 +1,6 @@
 import pytest
 
-from ..Tree import Tree
+from ..Tree import Tree, bin_indices, bin_lookup, entropies, histograms
 from ..Population import Population
 from ..Genome import Genome
 
@@ -44,6 +44,23 @@ class TestTree:
         assert list(tree.source_branch.keys()) == [4, 8]
         assert list(tree.recipient_branch.keys()) == [7]
 
+    def test_categorize_unsorted_mutations(self, source_pop, recipient_pop):
+        tree = Tree.initialized(
+            Genome([8, 3, 1, 4, 2]),
+            Genome([7, 2, 1, 3]),
+            source_pop,
+            recipient_pop,
+        )
+        assert list(tree.shared_branch.keys()) == [1, 2, 3]
+        assert list(tree.source_branch.keys()) == [4, 8]
+        assert list(tree.recipient_branch.keys()) == [7]
+
+        tree = Tree.initialized(
+            Genome([]), Genome([5]), source_pop, recipient_pop
+        )
+        assert tree.shared_branch == tree.source_branch == {}
+        assert list(tree.recipient_branch) == [5]
+
     def test_assign_proportions(self, tree):
         assert tree.shared_branch[1]["source_proportion"] == 1
         assert tree.shared_branch[1]["recipient_proportion"] == 1
@@ -247,6 +264,40 @@ class TestTree:
         print("source:", tree.standard_entropy([5, 1, 1, 1, 1, 1]))
         print("recipient:", tree.standard_entropy([0, 3, 0, 2, 3, 2]))
 
+    def test_entropies_match_baseline(self):
+        import math
+        import random
+
+        import numpy as np
+
+        def baseline_entropy(binned_proportions):
+            if len(binned_proportions) <= 1 or sum(binned_proportions) == 1:
+                return 0
+            props = [p / sum(binned_proportions) for p in binned_proportions]
+            return sum([p * math.log(p) if p > 0 else 0 for p in props]) * -1
+
+        # permuted histograms are where summation order decides the calls
+        rng = random.Random(4)
+        rows = []
+        for _ in range(2000):
+            row = [rng.randint(0, 30) for _ in range(rng.choice([4, 10]))]
+            row[0] += 2
+            shuffled = row[:]
+            rng.shuffle(shuffled)
+            rows.append((row, shuffled))
+
+        tree = Tree()
+        for row, shuffled in rows:
+            expected = baseline_entropy(row) < baseline_entropy(shuffled)
+            assert (tree.standard_entropy(row)
+                    < tree.standard_entropy(shuffled)) == expected
+            assert tree.standard_entropy(row) == baseline_entropy(row)
+
+        tens = np.array([row for row, _ in rows if len(row) == 10])
+        assert entropies(tens).tolist() == [
+            baseline_entropy(row) for row in tens.tolist()
+        ]
+
     def test_check_clumpiness(self):
         tree = Tree()
         assert tree.check_clumpiness({}, num_bins=10) == {
@@ -337,3 +388,43 @@ class TestTree:
             output["ancestral to recipient lineage"]["source"]
             < output["ancestral to recipient lineage"]["recipient"]
         )
+
+    def test_bin_lookup(self):
+        for sample_size in (1, 3, 7, 100):
+            for num_bins in (1, 3, 10, 100):
+                proportions = [c / sample_size for c in range(sample_size + 1)]
+                assert bin_lookup(sample_size, num_bins).tolist() \
+                    == bin_indices(proportions, num_bins).tolist()
+
+    def test_entropies(self):
+        tree = Tree()
+        binned = [[0, 0, 1, 3, 3], [0, 0, 0, 0, 7], [0, 1, 0, 0, 0], [0] * 5]
+        assert entropies(binned).tolist() == [
+            tree.standard_entropy(row) for row in binned
+        ]
+        assert entropies([[4], [1]]).tolist() == [0, 0]
+        assert entropies(binned)[3] == 0
+
+        bins = bin_indices([1, 0.1, 1, 0], num_bins=2)
+        assert histograms(bins, 2).tolist() == [[2, 2]]
+        assert histograms(bins, 2, rows=[0, 1, 1, 1], num_rows=2).tolist() \
+            == [[0, 1], [2, 1]]
+
+    def test_clumpiness_composite_histogram_algebra(self, tree):
+        output = tree.check_clumpiness_composite(num_bins=3)
+        ancestral_to_source = tree.shared_branch | tree.source_branch
+        ancestral_to_recipient = tree.shared_branch | tree.recipient_branch
+        assert output["ancestral to source lineage"] == {
+            "source": tree.standard_entropy(tree.bin_proportions(
+                [v["source_proportion"]
+                 for v in ancestral_to_source.values()], 3
+            )),
+            "recipient": tree.standard_entropy(tree.bin_proportions(
+                [v["recipient_proportion"]
+                 for v in ancestral_to_source.values()], 3
+            )),
+        }
+        assert output["ancestral to recipient lineage"]["recipient"] \
+            == tree.check_clumpiness(ancestral_to_recipient, 3)[
+                "recipient entropy"
+            ]
@@ -0,0 +1,158 @@
+#include <vector>
+#include <map>
+#include <cmath>
+#include <algorithm>
+#include <stdio.h>
+
+#include "clones.hpp"
+#include "genome.hpp"
+#include "population.hpp"
+#include "../utils.hpp"
+
+using std::vector;
+
+
+vector<Clone> init_clones() {
+    vector<Clone> clones;
+    clones.push_back(Clone{new Genome, 1});
+    return clones;
+}
+
+void free_clones(vector<Clone> &clones) {
+    for (Clone &clone : clones) {
+        delete clone.genome;
+    }
+    clones.clear();
+}
+
+uint64_t count_individuals(const vector<Clone> &clones) {
+    uint64_t individuals = 0;
+    for (const Clone &clone : clones) {
+        individuals += clone.count;
+    }
+    return individuals;
+}
+
+// index of the clone carrying the given individual, clones in order
+static size_t find_individual(const vector<Clone> &clones,
+                              uint64_t individual) {
+    size_t i = 0;
+    while (individual >= clones[i].count) {
+        individual -= clones[i].count;
+        i++;
+    }
+    return i;
+}
+
+void mutate_clones(vector<Clone> &clones, double mutation_rate,
+                   int genome_length, Rng &rng) {
+
+    // same number of mutations as mutate_population
+    uint64_t individuals = count_individuals(clones);
+    float mutations_expected = mutation_rate * genome_length * individuals;
+    int rounded_mutations_expected = (int) round(mutations_expected);
+    int poisson_mutations = poisson_dist(rounded_mutations_expected, rng);
+
+    // a uniformly chosen individual picks its clone in proportion to the
+    // clone's count and leaves it for a new clone of one
+    for (int i = 0; i < poisson_mutations; i++) {
+        size_t selected = find_individual(
+            clones, uniform_random_in_range((int) individuals, rng));
+        if (clones[selected].count > 1) {
+            clones[selected].count--;
+            clones.push_back(Clone{copy_genome(clones[selected].genome), 1});
+            selected = clones.size() - 1;
+        }
+        add_random_mutation(clones[selected].genome, genome_length, rng);
+    }
+}
+
+void reproduce_clones(vector<Clone> &clones, int carrying_capacity,
+                      Rng &rng) {
+    // every individual replicates, then carrying_capacity of them survive
+    // uniformly without replacement, as in select_population; the survivors
+    // per clone are multivariate hypergeometric, drawn as one conditional
+    // hypergeometric per clone
+    uint64_t remaining = 2 * count_individuals(clones);
+    uint64_t draws = std::min<uint64_t>(remaining, carrying_capacity);
+    size_t kept = 0;
+    for (Clone &clone : clones) {
+        uint64_t offspring = 2 * clone.count;
+        uint64_t survivors = hypergeometric_dist(
+            offspring, remaining - offspring, draws, rng);
+        remaining -= offspring;
+        draws -= survivors;
+        if (survivors == 0) {
+            delete clone.genome;
+            continue;
+        }
+        clone.count = survivors;
+        clones[kept++] = clone;
+    }
+    clones.resize(kept);
+}
+
+void evolve_clones(vector<Clone> &clones, SimulationParameters params,
+                   int generations, Rng &rng) {
+
+    for (int i = 0; i < generations; i++) {
+        if (i % 500 == 0) {
+            printf("repetition %d generation %d\n", params.repetition, i);
+        }
+        mutate_clones(clones, params.mutation_rate, params.genome_length,
+                      rng);
+        reproduce_clones(clones, params.carrying_capacity, rng);
+    }
+}
+
+void transmit_clones(vector<Clone> &source_clones,
+                     vector<Clone> &recipient_clones, int bottleneck,
+                     Rng &rng) {
+
+    // individuals are drawn with replacement as in transmit, draws from the
+    // same source clone join one recipient clone
+    uint64_t individuals = count_individuals(source_clones);
+    std::map<size_t, size_t> transmitted;
+    for (int i = 0; i < bottleneck; i++) {
+        size_t selected = find_individual(
+            source_clones, uniform_random_in_range((int) individuals, rng));
+        auto found = transmitted.find(selected);
+        if (found == transmitted.end()) {
+            transmitted[selected] = recipient_clones.size();
+            recipient_clones.push_back(
+                Clone{copy_genome(source_clones[selected].genome), 1});
+        } else {
+            recipient_clones[found->second].count++;
+        }
+    }
+}
+
+vector<Genome*> expand_clones(vector<Clone> &clones) {
+    vector<Genome*> population;
+    population.reserve(count_individuals(clones));
+    for (Clone &clone : clones) {
+        population.insert(population.end(), clone.count, clone.genome);
+    }
+    return population;
+}
+
+vector<Haplotype> clone_haplotypes(vector<Clone> &clones) {
+    // clones are distinct lineages, but two may still carry the same
+    // mutations
+    std::map<vector<int>, size_t> index;
+    vector<Haplotype> haplotypes;
+    for (Clone &clone : clones) {
+        vector<int> mutations = genome_mutations(clone.genome);
+        auto found = index.find(mutations);
+        size_t haplotype;
+        if (found == index.end()) {
+            haplotype = haplotypes.size();
+            index[mutations] = haplotype;
+            haplotypes.push_back(Haplotype{std::move(mutations), 0});
+        } else {
+            haplotype = found->second;
+        }
+        haplotypes[haplotype].count += clone.count;
+    }
+    return haplotypes;
+}
@@ -0,0 +1,38 @@
+#ifndef CLONES_HPP
+#define CLONES_HPP
+
+#include <cstdint>
+#include <vector>
+
+#include "genome.hpp"
+#include "population.hpp"
+#include "../utils.hpp"
+
+// individuals carrying the same genome, held once with their number; a
+// population of clones costs memory and time in the number of haplotypes
+// rather than the number of individuals
+struct Clone {
+    Genome* genome;
+    uint64_t count;
+};
+
+std::vector<Clone> init_clones();
+void free_clones(std::vector<Clone> &clones);
+uint64_t count_individuals(const std::vector<Clone> &clones);
+
+void mutate_clones(std::vector<Clone> &clones, double mutation_rate,
+                   int genome_length, Rng &rng);
+void reproduce_clones(std::vector<Clone> &clones, int carrying_capacity,
+                      Rng &rng);
+void evolve_clones(std::vector<Clone> &clones, SimulationParameters params,
+                   int generations, Rng &rng);
+
+void transmit_clones(std::vector<Clone> &source_clones,
+                     std::vector<Clone> &recipient_clones, int bottleneck,
+                     Rng &rng);
+
+// every individual as a genome, individuals of a clone share its pointer
+std::vector<Genome*> expand_clones(std::vector<Clone> &clones);
+std::vector<Haplotype> clone_haplotypes(std::vector<Clone> &clones);
+
+#endif
@@ -1,4 +1,6 @@
 #include <vector>
+#include <memory>
+#include <utility>
 
 #include "genome.hpp"
 #include "../utils.hpp"
@@ -6,15 +8,57 @@
 
 using std::vector;
 
-void add_random_mutation(Genome* genome, int genome_length) {
-    int mutation = uniform_random_in_range(genome_length + 1, random_seed);
+Lineage::~Lineage() {
+    // release long chains of ancestors iteratively rather than by recursion
+    std::shared_ptr<Lineage> next = std::move(parent);
+    while (next && next.use_count() == 1) {
+        next = std::move(next->parent);
+    }
+}
+
+void add_random_mutation(Genome* genome, int genome_length, Rng &rng) {
+    int mutation = uniform_random_in_range(genome_length + 1, rng);
     genome->mutations.push_back(mutation);
 }
 
 Genome* copy_genome(Genome* genome) {
-    Genome* copy = new Genome{};
-    for (int mutation : genome->mutations) {
-        copy->mutations.push_back(mutation);
+    // freeze the new mutations into a lineage node both copies share
+    if (!genome->mutations.empty()) {
+        auto node = std::make_shared<Lineage>();
+        node->parent = genome->ancestry;
+        node->length = genome_length(genome);
+        node->mutations = std::move(genome->mutations);
+        genome->mutations.clear();
+        genome->ancestry = node;
     }
+    Genome* copy = new Genome{};
+    copy->ancestry = genome->ancestry;
     return copy;
 }
+
+size_t genome_length(const Genome* genome) {
+    size_t length = genome->mutations.size();
+    if (genome->ancestry) {
+        length += genome->ancestry->length;
+    }
+    return length;
+}
+
+vector<int> genome_mutations(const Genome* genome) {
+    // oldest mutations first, the order they were added in
+    vector<const Lineage*> nodes;
+    for (const Lineage* node = genome->ancestry.get(); node != nullptr;
+         node = node->parent.get()) {
+        nodes.push_back(node);
+    }
+
+    vector<int> mutations;
+    mutations.reserve(genome_length(genome));
+    for (auto node = nodes.rbegin(); node != nodes.rend(); node++) {
+        mutations.insert(mutations.end(), (*node)->mutations.begin(),
+                         (*node)->mutations.end());
+    }
+    mutations.insert(mutations.end(), genome->mutations.begin(),
+                     genome->mutations.end());
+    return mutations;
+}
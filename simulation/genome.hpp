@@ -1,15 +1,31 @@
 #ifndef GENOME_HPP
 #define GENOME_HPP
 
+#include <cstddef>
+#include <memory>
 #include <vector>
 
-extern int random_seed;
+#include "../utils.hpp"
+
+// mutations shared by all descendants of a genome, frozen when it is copied;
+// a genome's full mutation list is its lineage from the root down plus its
+// own new mutations
+struct Lineage {
+    std::shared_ptr<Lineage> parent;
+    std::vector<int> mutations;  // added since the parent node
+    size_t length = 0;  // mutations from the root through this node
+
+    ~Lineage();
+};
 
 struct Genome {
-    std::vector<int> mutations;
+    std::shared_ptr<Lineage> ancestry;
+    std::vector<int> mutations;  // added since the genome was last copied
 };
 
-void add_random_mutation(Genome* genome, int genome_length);
+void add_random_mutation(Genome* genome, int genome_length, Rng &rng);
 Genome* copy_genome(Genome* genome);
+size_t genome_length(const Genome* genome);
+std::vector<int> genome_mutations(const Genome* genome);
 
-#endif
\ No newline at end of file
+#endif
@@ -1,9 +1,12 @@
 #include <vector>
+#include <cstring>
 #include <stdio.h>
 #include <cmath>
 #include <fstream>
 #include <iostream>
 #include <string>
+#include <map>
+#include <utility>
 
 
 #include "population.hpp"
@@ -20,6 +23,13 @@ vector<Genome*> init_population() {
     return population;
 }
 
+void free_population(vector<Genome*> &population) {
+    for (Genome* genome : population) {
+        delete genome;
+    }
+    population.clear();
+}
+
 void replicate_population(vector<Genome*> &population) {
     int initial_size = population.size();
     for (int i = 0; i < initial_size; i++) {
@@ -28,28 +38,27 @@ void replicate_population(vector<Genome*> &population) {
 }
 
 void mutate_population(vector<Genome*> &population, double mutation_rate,
-                       int genome_length) {
+                       int genome_length, Rng &rng) {
 
     // calculate number of mutations expected this generation
     float mutations_expected = (mutation_rate * genome_length * 
                                 population.size());
     int rounded_mutations_expected = (int) round(mutations_expected);
-    int poisson_mutations = poisson_dist(rounded_mutations_expected, 
-                                         random_seed);
+    int poisson_mutations = poisson_dist(rounded_mutations_expected, rng);
     
     // select and mutate genomes
     int selected_genome;
     for (int i = 0; i < poisson_mutations; i++) {
-        selected_genome = uniform_random_in_range(population.size(), 
-                                                  random_seed);
-        add_random_mutation(population[selected_genome], genome_length);
+        selected_genome = uniform_random_in_range(population.size(), rng);
+        add_random_mutation(population[selected_genome], genome_length, rng);
     }
 }
 
-void select_population(vector<Genome*> &population, int carrying_capacity) {
+void select_population(vector<Genome*> &population, int carrying_capacity,
+                       Rng &rng) {
     int selected;
     while (population.size() > carrying_capacity) {
-        selected = uniform_random_in_range(population.size(), random_seed);
+        selected = uniform_random_in_range(population.size(), rng);
         delete population[selected];
         population[selected] = population[population.size() - 1];
         population.pop_back();
@@ -57,26 +66,28 @@ void select_population(vector<Genome*> &population, int carrying_capacity) {
 }
 
 void evolve_population(vector<Genome*> &population, 
-                       SimulationParameters params, int generations) {
+                       SimulationParameters params, int generations,
+                       Rng &rng) {
 
     for (int i = 0; i < generations; i++) {
         if (i % 500 == 0) {
-            printf("generation %d\n", i);
+            printf("repetition %d generation %d\n", params.repetition, i);
         }
         mutate_population(population, params.mutation_rate, 
-                          params.genome_length);
+                          params.genome_length, rng);
         replicate_population(population);
-        select_population(population, params.carrying_capacity);
+        select_population(population, params.carrying_capacity, rng);
     }
 }
 
 void transmit(vector<Genome*> &source_population, 
-              vector<Genome*> &recipient_population, int bottleneck) {
+              vector<Genome*> &recipient_population, int bottleneck,
+              Rng &rng) {
 
     int selected_genome;
     for (int i = 0; i < bottleneck; i++) {
         selected_genome = uniform_random_in_range(source_population.size(), 
-                                                  random_seed);
+                                                  rng);
         recipient_population.push_back(
             copy_genome(source_population[selected_genome]));
     }
@@ -86,10 +97,99 @@ void population_to_file(vector<Genome*> &population, std::string output_file) {
     std::ofstream file;
     file.open(output_file);
     for (Genome* genome : population) {
-        for (int mutation : genome->mutations) {
+        for (int mutation : genome_mutations(genome)) {
+            file << mutation << ',';
+        }
+        file << '\n';
+    }
+    file.close();
+}
+
+void population_to_binary_file(vector<Genome*> &population,
+                               std::string output_file,
+                               SimulationParameters params) {
+    vector<uint64_t> offsets;
+    offsets.reserve(population.size() + 1);
+    offsets.push_back(0);
+    for (Genome* genome : population) {
+        offsets.push_back(offsets.back() + genome_length(genome));
+    }
+
+    BinaryPopulationHeader header{};
+    std::memcpy(header.magic, "TSPOPBIN", sizeof(header.magic));
+    header.version = 1;
+    header.genome_size = params.genome_length;
+    header.run_id = params.run_id;
+    header.repetition = params.repetition;
+    header.genome_count = population.size();
+    header.mutation_count = offsets.back();
+
+    std::ofstream file(output_file, std::ios::binary);
+    file.write(reinterpret_cast<const char*>(&header), sizeof(header));
+    file.write(reinterpret_cast<const char*>(offsets.data()),
+               offsets.size() * sizeof(uint64_t));
+    for (Genome* genome : population) {
+        vector<int> lineage = genome_mutations(genome);
+        vector<int32_t> mutations(lineage.begin(), lineage.end());
+        file.write(reinterpret_cast<const char*>(mutations.data()),
+                   mutations.size() * sizeof(int32_t));
+    }
+    file.close();
+}
+
+vector<Haplotype> population_haplotypes(vector<Genome*> &population) {
+    // clones share their lineage node and own mutations, so genomes are
+    // grouped by those first and only one genome per group is materialized
+    std::map<std::pair<const Lineage*, vector<int>>, size_t> groups;
+    std::map<vector<int>, size_t> index;
+    vector<Haplotype> haplotypes;
+    for (Genome* genome : population) {
+        std::pair<const Lineage*, vector<int>> key{genome->ancestry.get(),
+                                                   genome->mutations};
+        auto group = groups.find(key);
+        if (group == groups.end()) {
+            vector<int> mutations = genome_mutations(genome);
+            auto found = index.find(mutations);
+            size_t haplotype;
+            if (found == index.end()) {
+                haplotype = haplotypes.size();
+                index[mutations] = haplotype;
+                haplotypes.push_back(Haplotype{std::move(mutations), 0});
+            } else {
+                haplotype = found->second;
+            }
+            group = groups.insert({key, haplotype}).first;
+        }
+        haplotypes[group->second].count++;
+    }
+    return haplotypes;
+}
+
+void haplotypes_to_file(vector<Haplotype> &haplotypes,
+                        std::string output_file) {
+    std::ofstream file(output_file);
+    for (Haplotype &haplotype : haplotypes) {
+        file << haplotype.count << ':';
+        for (int mutation : haplotype.mutations) {
             file << mutation << ',';
         }
         file << '\n';
     }
     file.close();
 }
+
+void mutations_to_file(vector<Haplotype> &haplotypes,
+                       std::string output_file) {
+    std::map<int, uint64_t> counts;
+    for (Haplotype &haplotype : haplotypes) {
+        for (int mutation : haplotype.mutations) {
+            counts[mutation] += haplotype.count;
+        }
+    }
+
+    std::ofstream file(output_file);
+    for (auto &[mutation, count] : counts) {
+        file << mutation << ',' << count << '\n';
+    }
+    file.close();
+}
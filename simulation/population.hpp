@@ -1,12 +1,12 @@
 #ifndef POPULATION_HPP
 #define POPULATION_HPP
 
+#include <cstdint>
 #include <vector>
 #include <string>
 
 #include "genome.hpp"
-
-extern int random_seed;
+#include "../utils.hpp"
 
 
 struct SimulationParameters {
@@ -19,22 +19,62 @@ struct SimulationParameters {
     int recipient_generations;
     int bottleneck;
     std::string output_path;
+    std::string output_format;  // "csv", "binary" or "haplotypes"
+    std::string engine;  // "individuals" or "haplotype counts"
+    std::string snapshot_path;  // empty for no source snapshots
+    bool output_mutation_table;
+};
+
+// unique genomes of a population with the number of individuals carrying
+// each, in order of first appearance
+struct Haplotype {
+    std::vector<int> mutations;
+    uint64_t count;
 };
 
+// binary population file layout (native byte order):
+//     header, uint64 offsets[genome_count + 1], int32 mutations[mutation_count]
+// genome i owns mutations[offsets[i]:offsets[i + 1]]
+struct BinaryPopulationHeader {
+    char magic[8];
+    uint32_t version;
+    int32_t genome_size;
+    int32_t run_id;
+    int32_t repetition;
+    uint64_t genome_count;
+    uint64_t mutation_count;
+};
+static_assert(sizeof(BinaryPopulationHeader) == 40,
+              "binary header layout is read by the python analysis");
+
 std::vector<Genome*> init_population();
+void free_population(std::vector<Genome*> &population);
 
 void replicate_population(std::vector<Genome*> &population);
 void mutate_population(std::vector<Genome*> &population, double mutation_rate, 
-                       int genome_length);
+                       int genome_length, Rng &rng);
 void select_population(std::vector<Genome*> &population, 
-                       int carrying_capacity);
+                       int carrying_capacity, Rng &rng);
 void evolve_population(std::vector<Genome*> &population, 
-                       SimulationParameters params, int generations);
+                       SimulationParameters params, int generations, Rng &rng);
 
 void transmit(std::vector<Genome*> &source_population, 
-              std::vector<Genome*> &recipient_population, int bottleneck);
+              std::vector<Genome*> &recipient_population, int bottleneck,
+              Rng &rng);
 
 void population_to_file(std::vector<Genome*> &population, 
                         std::string output_file);
+void population_to_binary_file(std::vector<Genome*> &population,
+                               std::string output_file,
+                               SimulationParameters params);
+
+std::vector<Haplotype> population_haplotypes(
+    std::vector<Genome*> &population);
+// one haplotype per line: "count:mutation,mutation,...,"
+void haplotypes_to_file(std::vector<Haplotype> &haplotypes,
+                        std::string output_file);
+// one mutation per line: "mutation,count", count of individuals carrying it
+void mutations_to_file(std::vector<Haplotype> &haplotypes,
+                       std::string output_file);
 
 #endif
\ No newline at end of file
@@ -2,14 +2,21 @@
 #include <cmath>
 #include <fstream>
 #include <iostream>
+#include <sstream>
 
 #include "../json.hpp"
 using nlohmann::json;
 
 #include "population.hpp"
+#include "clones.hpp"
+#include "snapshot.hpp"
 #include "genome.hpp"
 #include "../utils.hpp"
 
+#include <algorithm>
+#include <atomic>
+#include <filesystem>
+#include <thread>
 #include <vector>
 
 using std::vector;
@@ -17,11 +24,37 @@ using std::string;
 using std::cout;
 using std::endl;
 
-int random_seed;
+// one transmission from the evolved source population
+struct Scenario {
+    int bottleneck;
+    int recipient_generations;
+    bool seeded;  // otherwise continues the source generator
+    int seed;
+    string output_path;
+    // recipient generations to write both populations at, each to files
+    // suffixed _gen_<generation>; empty to write them once at the end
+    vector<int> sampling_generations;
+};
+
+void run_repetition(SimulationParameters params,
+                    vector<Scenario> &scenarios, int random_seed);
+Snapshot evolve_source(SimulationParameters &params, int random_seed);
+string source_key(SimulationParameters &params, int random_seed);
+void run_scenario(Snapshot &source, SimulationParameters params,
+                  Scenario &scenario);
+void run_clone_scenario(Snapshot &source, SimulationParameters params,
+                        Scenario &scenario);
+vector<int> sampling_generations(vector<int> generations,
+                                 int recipient_generations);
+string output_stem(SimulationParameters &params, string population);
+void write_population(vector<Genome*> &population, string stem,
+                      SimulationParameters &params);
+void write_clones(vector<Clone> &clones, string stem,
+                  SimulationParameters &params);
 
 int main(int argc, char** argv) {
 
-    // ./sim json_params_file [output_path] [random_seed] [repetition]
+    // ./sim json_params_file [output_path] [random_seed] [first_repetition]
 
     std::ifstream json_params_file(argv[1]);
     json json_params = json::parse(json_params_file);
@@ -33,8 +66,35 @@ int main(int argc, char** argv) {
     params.genome_length = json_params["genome size"];
     params.carrying_capacity = json_params["carrying capacity"];
     params.source_generations = json_params["source generations"];
-    params.bottleneck = json_params["bottleneck"];
-    params.recipient_generations = json_params["recipient generations"];
+    vector<int> sampling = json_params.value("sampling generations",
+                                             vector<int>());
+    if (json_params.contains("scenarios")) {
+        // defaults for the scenarios
+        params.bottleneck = json_params.value("bottleneck", 1);
+    } else {
+        params.bottleneck = json_params["bottleneck"];
+    }
+    if (json_params.contains("scenarios") || !sampling.empty()) {
+        int last_sampled = 0;
+        if (!sampling.empty()) {
+            last_sampled = *std::max_element(sampling.begin(),
+                                             sampling.end());
+        }
+        params.recipient_generations =
+            json_params.value("recipient generations", last_sampled);
+    } else {
+        params.recipient_generations = json_params["recipient generations"];
+    }
+    params.output_format = json_params.value("output format", "csv");
+    params.output_mutation_table =
+        json_params.value("output mutation table", false);
+    params.engine = json_params.value("engine", "individuals");
+    params.snapshot_path = json_params.value("source snapshot", "");
+    int repetitions = json_params.value("repetitions", 1);
+    int threads = json_params.value("threads", 1);
+    if (threads < 1) {
+        threads = std::max(1u, std::thread::hardware_concurrency());
+    }
 
     if (argc > 2) {
         params.output_path = argv[2];
@@ -42,42 +102,269 @@ int main(int argc, char** argv) {
         params.output_path = ".";
     }
 
+    int random_seed;
     if (argc > 3) {
         random_seed = atoi(argv[3]);
     } else {
         random_seed = 1;
     }
 
+    int first_repetition;
     if (argc > 4) {
-        params.repetition = atoi(argv[4]);
+        first_repetition = atoi(argv[4]);
     } else {
-        params.repetition = 0;
+        first_repetition = 0;
     }
 
+    // without scenarios the run is the one scenario its parameters describe;
+    // otherwise scenario i is written to output_path/scenario_i along with
+    // its own simulation parameters file for the analysis
+    vector<Scenario> scenarios;
+    if (!json_params.contains("scenarios")) {
+        scenarios.push_back(Scenario{
+            params.bottleneck, params.recipient_generations, false, 0,
+            params.output_path,
+            sampling_generations(sampling, params.recipient_generations)});
+    }
+    json scenario_list = json_params.value("scenarios", json::array());
+    for (size_t i = 0; i < scenario_list.size(); i++) {
+        json scenario_params = scenario_list[i];
+        Scenario scenario;
+        scenario.bottleneck =
+            scenario_params.value("bottleneck", params.bottleneck);
+        scenario.recipient_generations = scenario_params.value(
+            "recipient generations", params.recipient_generations);
+        scenario.seeded = scenario_params.contains("seed");
+        scenario.seed = scenario_params.value("seed", 0);
+        scenario.output_path =
+            params.output_path + "/scenario_" + std::to_string(i);
+        scenario.sampling_generations = sampling_generations(
+            scenario_params.value("sampling generations", sampling),
+            scenario.recipient_generations);
+        scenarios.push_back(scenario);
+
+        json scenario_sim_params = json_params;
+        scenario_sim_params.erase("scenarios");
+        scenario_sim_params.update(scenario_params);
+        scenario_sim_params["bottleneck"] = scenario.bottleneck;
+        scenario_sim_params["recipient generations"] =
+            scenario.recipient_generations;
+        std::filesystem::create_directories(scenario.output_path);
+        std::ofstream scenario_file(scenario.output_path +
+                                    "/sim_params.json");
+        scenario_file << scenario_sim_params.dump(2) << '\n';
+    }
+
+    // repetitions are numbered from first_repetition and each draws from
+    // its own generator, so a repetition's output only depends on the seed
+    // and its number, not on the thread that runs it
+    std::atomic<int> next_repetition{0};
+    auto worker = [&]() {
+        int repetition;
+        while ((repetition = next_repetition++) < repetitions) {
+            SimulationParameters repetition_params = params;
+            repetition_params.repetition = first_repetition + repetition;
+            run_repetition(repetition_params, scenarios, random_seed);
+        }
+    };
+    vector<std::thread> pool;
+    for (int i = 0; i < std::min(threads, repetitions); i++) {
+        pool.emplace_back(worker);
+    }
+    for (std::thread &thread : pool) {
+        thread.join();
+    }
+}
 
+void run_repetition(SimulationParameters params,
+                    vector<Scenario> &scenarios, int random_seed) {
+    // the source phase is shared by all scenarios and, given a snapshot
+    // directory, by later runs too
+    Snapshot source;
+    string snapshot_file;
+    if (!params.snapshot_path.empty()) {
+        std::filesystem::create_directories(params.snapshot_path);
+        snapshot_file = params.snapshot_path + "/run_" +
+                        std::to_string(params.run_id) + "_source_rep_" +
+                        std::to_string(params.repetition) + ".snap";
+    }
+    // a snapshot of another seed or source phase is evolved anew and
+    // replaced
+    if (snapshot_file.empty() || !snapshot_from_file(source, snapshot_file) ||
+        source.source_key != source_key(params, random_seed)) {
+        source = evolve_source(params, random_seed);
+        if (!snapshot_file.empty() &&
+            !snapshot_to_file(source, snapshot_file)) {
+            std::cerr << "could not save source snapshot " << snapshot_file
+                      << std::endl;
+        }
+    }
 
-    // simulation
+    for (Scenario &scenario : scenarios) {
+        if (params.engine == "haplotype counts") {
+            run_clone_scenario(source, params, scenario);
+        } else {
+            run_scenario(source, params, scenario);
+        }
+    }
+}
 
-        // evolution in source
+Snapshot evolve_source(SimulationParameters &params, int random_seed) {
+    Rng rng = make_rng(random_seed, params.repetition);
+    Snapshot source;
+    if (params.engine == "haplotype counts") {
+        vector<Clone> source_clones = init_clones();
+        evolve_clones(source_clones, params, params.source_generations, rng);
+        source = clones_snapshot(source_clones, rng);
+        free_clones(source_clones);
+    } else {
         vector<Genome *> source_pop = init_population();
-        evolve_population(source_pop, params, params.source_generations);
-
-        // transmission
-        vector<Genome *> recipient_pop;
-        transmit(source_pop, recipient_pop, params.bottleneck);
-
-        // evolution post transmission
-        evolve_population(source_pop, params, params.recipient_generations);
-        evolve_population(recipient_pop, params, params.recipient_generations);
-
-        // write output
-        string source_file =
-            params.output_path + "/run_" + std::to_string(params.run_id) +
-            "_source_pop_rep_" + std::to_string(params.repetition) + ".csv";
-        string recipient_file =
-            params.output_path + "/run_" + std::to_string(params.run_id) +
-            "_recipient_pop_rep_" + std::to_string(params.repetition) + ".csv";
-        population_to_file(source_pop, source_file);
-        population_to_file(recipient_pop, recipient_file);
+        evolve_population(source_pop, params, params.source_generations, rng);
+        source = population_snapshot(source_pop, rng);
+        free_population(source_pop);
+    }
+    source.source_key = source_key(params, random_seed);
+    return source;
+}
+
+string source_key(SimulationParameters &params, int random_seed) {
+    // everything the source population depends on
+    std::ostringstream key;
+    key.precision(17);
+    key << "seed " << random_seed << " repetition " << params.repetition
+        << " engine " << params.engine << " mutation rate "
+        << params.mutation_rate << " genome size " << params.genome_length
+        << " carrying capacity " << params.carrying_capacity
+        << " source generations " << params.source_generations;
+    return key.str();
 }
 
+void run_scenario(Snapshot &source, SimulationParameters params,
+                  Scenario &scenario) {
+    params.bottleneck = scenario.bottleneck;
+    params.recipient_generations = scenario.recipient_generations;
+    params.output_path = scenario.output_path;
+    Rng rng = scenario.seeded ? make_rng(scenario.seed, params.repetition)
+                              : snapshot_rng(source);
+    vector<Genome *> source_pop = snapshot_population(source);
+
+    // transmission
+    vector<Genome *> recipient_pop;
+    transmit(source_pop, recipient_pop, params.bottleneck, rng);
+
+    // evolution post transmission, up to each sampling generation in turn
+    if (scenario.sampling_generations.empty()) {
+        evolve_population(source_pop, params, params.recipient_generations,
+                          rng);
+        evolve_population(recipient_pop, params,
+                          params.recipient_generations, rng);
+        write_population(source_pop, output_stem(params, "source"), params);
+        write_population(recipient_pop, output_stem(params, "recipient"),
+                         params);
+    }
+    int evolved = 0;
+    for (int generation : scenario.sampling_generations) {
+        evolve_population(source_pop, params, generation - evolved, rng);
+        evolve_population(recipient_pop, params, generation - evolved, rng);
+        evolved = generation;
+        string suffix = "_gen_" + std::to_string(generation);
+        write_population(source_pop, output_stem(params, "source") + suffix,
+                         params);
+        write_population(recipient_pop,
+                         output_stem(params, "recipient") + suffix, params);
+    }
+
+    free_population(source_pop);
+    free_population(recipient_pop);
+}
+
+void run_clone_scenario(Snapshot &source, SimulationParameters params,
+                        Scenario &scenario) {
+    // same model as run_scenario with individuals grouped by haplotype
+    params.bottleneck = scenario.bottleneck;
+    params.recipient_generations = scenario.recipient_generations;
+    params.output_path = scenario.output_path;
+    Rng rng = scenario.seeded ? make_rng(scenario.seed, params.repetition)
+                              : snapshot_rng(source);
+    vector<Clone> source_clones = snapshot_clones(source);
+
+    vector<Clone> recipient_clones;
+    transmit_clones(source_clones, recipient_clones, params.bottleneck, rng);
+
+    if (scenario.sampling_generations.empty()) {
+        evolve_clones(source_clones, params, params.recipient_generations,
+                      rng);
+        evolve_clones(recipient_clones, params, params.recipient_generations,
+                      rng);
+        write_clones(source_clones, output_stem(params, "source"), params);
+        write_clones(recipient_clones, output_stem(params, "recipient"),
+                     params);
+    }
+    int evolved = 0;
+    for (int generation : scenario.sampling_generations) {
+        evolve_clones(source_clones, params, generation - evolved, rng);
+        evolve_clones(recipient_clones, params, generation - evolved, rng);
+        evolved = generation;
+        string suffix = "_gen_" + std::to_string(generation);
+        write_clones(source_clones, output_stem(params, "source") + suffix,
+                     params);
+        write_clones(recipient_clones,
+                     output_stem(params, "recipient") + suffix, params);
+    }
+
+    free_clones(source_clones);
+    free_clones(recipient_clones);
+}
+
+vector<int> sampling_generations(vector<int> generations,
+                                 int recipient_generations) {
+    // the last recipient generation is always written, nothing after it
+    if (generations.empty()) {
+        return generations;
+    }
+    generations.push_back(recipient_generations);
+    std::sort(generations.begin(), generations.end());
+    generations.erase(std::unique(generations.begin(), generations.end()),
+                      generations.end());
+    generations.erase(std::upper_bound(generations.begin(),
+                                       generations.end(),
+                                       recipient_generations),
+                      generations.end());
+    return generations;
+}
+
+string output_stem(SimulationParameters &params, string population) {
+    return params.output_path + "/run_" + std::to_string(params.run_id) +
+           "_" + population + "_pop_rep_" +
+           std::to_string(params.repetition);
+}
+
+void write_population(vector<Genome*> &population, string stem,
+                      SimulationParameters &params) {
+    if (params.output_format == "binary") {
+        population_to_binary_file(population, stem + ".bin", params);
+    } else if (params.output_format == "haplotypes") {
+        vector<Haplotype> haplotypes = population_haplotypes(population);
+        haplotypes_to_file(haplotypes, stem + ".hap");
+        if (params.output_mutation_table) {
+            mutations_to_file(haplotypes, stem + ".mut");
+        }
+    } else {
+        population_to_file(population, stem + ".csv");
+    }
+}
+
+void write_clones(vector<Clone> &clones, string stem,
+                  SimulationParameters &params) {
+    if (params.output_format == "haplotypes") {
+        vector<Haplotype> haplotypes = clone_haplotypes(clones);
+        haplotypes_to_file(haplotypes, stem + ".hap");
+        if (params.output_mutation_table) {
+            mutations_to_file(haplotypes, stem + ".mut");
+        }
+    } else {
+        // the genomes stay owned by the clones
+        vector<Genome*> population = expand_clones(clones);
+        write_population(population, stem, params);
+    }
+}
@@ -0,0 +1,186 @@
+#include <charconv>
+#include <cstdio>
+#include <fstream>
+#include <map>
+#include <sstream>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "snapshot.hpp"
+#include "genome.hpp"
+#include "clones.hpp"
+#include "../utils.hpp"
+
+using std::vector;
+
+
+static std::string rng_state(Rng &rng) {
+    std::ostringstream state;
+    state << rng;
+    return state.str();
+}
+
+Snapshot population_snapshot(vector<Genome*> &population, Rng &rng) {
+    // clones share their lineage node and own mutations, so each group is
+    // materialized once, as in population_haplotypes
+    Snapshot snapshot;
+    std::map<std::pair<const Lineage*, vector<int>>, size_t> groups;
+    for (Genome* genome : population) {
+        std::pair<const Lineage*, vector<int>> key{genome->ancestry.get(),
+                                                   genome->mutations};
+        auto group = groups.find(key);
+        if (group == groups.end()) {
+            group = groups.insert({key, snapshot.haplotypes.size()}).first;
+            snapshot.haplotypes.push_back(genome_mutations(genome));
+        }
+        if (!snapshot.runs.empty() &&
+            snapshot.runs.back().first == group->second) {
+            snapshot.runs.back().second++;
+        } else {
+            snapshot.runs.push_back({group->second, 1});
+        }
+    }
+    snapshot.rng_state = rng_state(rng);
+    return snapshot;
+}
+
+Snapshot clones_snapshot(vector<Clone> &clones, Rng &rng) {
+    Snapshot snapshot;
+    for (Clone &clone : clones) {
+        snapshot.runs.push_back({snapshot.haplotypes.size(), clone.count});
+        snapshot.haplotypes.push_back(genome_mutations(clone.genome));
+    }
+    snapshot.rng_state = rng_state(rng);
+    return snapshot;
+}
+
+static vector<std::shared_ptr<Lineage>> snapshot_lineages(
+    Snapshot &snapshot) {
+    // one root node per haplotype, shared by all its individuals
+    vector<std::shared_ptr<Lineage>> lineages;
+    for (vector<int> &mutations : snapshot.haplotypes) {
+        if (mutations.empty()) {
+            lineages.push_back(nullptr);
+            continue;
+        }
+        auto node = std::make_shared<Lineage>();
+        node->mutations = mutations;
+        node->length = mutations.size();
+        lineages.push_back(node);
+    }
+    return lineages;
+}
+
+vector<Genome*> snapshot_population(Snapshot &snapshot) {
+    vector<std::shared_ptr<Lineage>> lineages = snapshot_lineages(snapshot);
+    vector<Genome*> population;
+    for (auto &[haplotype, individuals] : snapshot.runs) {
+        for (uint64_t i = 0; i < individuals; i++) {
+            Genome* genome = new Genome;
+            genome->ancestry = lineages[haplotype];
+            population.push_back(genome);
+        }
+    }
+    return population;
+}
+
+vector<Clone> snapshot_clones(Snapshot &snapshot) {
+    vector<std::shared_ptr<Lineage>> lineages = snapshot_lineages(snapshot);
+    vector<Clone> clones;
+    for (auto &[haplotype, individuals] : snapshot.runs) {
+        Genome* genome = new Genome;
+        genome->ancestry = lineages[haplotype];
+        clones.push_back(Clone{genome, individuals});
+    }
+    return clones;
+}
+
+Rng snapshot_rng(Snapshot &snapshot) {
+    Rng rng;
+    std::istringstream state(snapshot.rng_state);
+    state >> rng;
+    return rng;
+}
+
+bool snapshot_to_file(Snapshot &snapshot, std::string output_file) {
+    // written aside and renamed, so an interrupted run leaves no partial
+    // snapshot behind for the next run to load
+    std::string partial_file = output_file + ".partial";
+    std::ofstream file(partial_file);
+    file << "tssnapshot 2\n" << snapshot.source_key << '\n'
+         << snapshot.rng_state << '\n';
+    file << snapshot.haplotypes.size() << '\n';
+    for (vector<int> &mutations : snapshot.haplotypes) {
+        for (int mutation : mutations) {
+            file << mutation << ',';
+        }
+        file << '\n';
+    }
+    file << snapshot.runs.size() << '\n';
+    for (auto &[haplotype, individuals] : snapshot.runs) {
+        file << haplotype << ':' << individuals << '\n';
+    }
+    file.close();
+    if (!file || std::rename(partial_file.c_str(), output_file.c_str())) {
+        std::remove(partial_file.c_str());
+        return false;
+    }
+    return true;
+}
+
+bool snapshot_from_file(Snapshot &snapshot, std::string input_file) {
+    std::ifstream file(input_file);
+    std::string line;
+    if (!std::getline(file, line) || line != "tssnapshot 2" ||
+        !std::getline(file, snapshot.source_key) ||
+        !std::getline(file, snapshot.rng_state)) {
+        return false;
+    }
+    Rng rng;
+    std::istringstream state(snapshot.rng_state);
+    if (!(state >> rng)) {
+        return false;
+    }
+
+    size_t haplotype_count, run_count;
+    if (!(file >> haplotype_count)) {
+        return false;
+    }
+    std::getline(file, line);
+    snapshot.haplotypes.assign(haplotype_count, vector<int>());
+    for (vector<int> &mutations : snapshot.haplotypes) {
+        if (!std::getline(file, line)) {
+            return false;
+        }
+        std::istringstream row(line);
+        std::string mutation;
+        while (std::getline(row, mutation, ',')) {
+            // a corrupt line is an unusable snapshot, not a crash
+            int value;
+            const char* end = mutation.data() + mutation.size();
+            auto [parsed, error] =
+                std::from_chars(mutation.data(), end, value);
+            if (error != std::errc() || parsed != end) {
+                return false;
+            }
+            mutations.push_back(value);
+        }
+    }
+
+    if (!(file >> run_count)) {
+        return false;
+    }
+    snapshot.runs.clear();
+    size_t haplotype;
+    uint64_t individuals;
+    char separator;
+    for (size_t i = 0; i < run_count; i++) {
+        if (!(file >> haplotype >> separator >> individuals) ||
+            separator != ':' || haplotype >= haplotype_count) {
+            return false;
+        }
+        snapshot.runs.push_back({haplotype, individuals});
+    }
+    return true;
+}
@@ -0,0 +1,43 @@
+#ifndef SNAPSHOT_HPP
+#define SNAPSHOT_HPP
+
+#include <cstdint>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "genome.hpp"
+#include "clones.hpp"
+#include "../utils.hpp"
+
+// an evolved population with the generator state it was left at, so any
+// number of transmission scenarios can start from it; either engine's
+// population can be restored into either engine
+struct Snapshot {
+    std::vector<std::vector<int>> haplotypes;
+    // individuals in population order: (haplotype, consecutive individuals)
+    std::vector<std::pair<size_t, uint64_t>> runs;
+    std::string rng_state;
+    // the seed and parameters the population was evolved with, checked
+    // before a saved snapshot is reused
+    std::string source_key;
+};
+
+Snapshot population_snapshot(std::vector<Genome*> &population, Rng &rng);
+Snapshot clones_snapshot(std::vector<Clone> &clones, Rng &rng);
+
+// fresh populations, owned by the caller
+std::vector<Genome*> snapshot_population(Snapshot &snapshot);
+std::vector<Clone> snapshot_clones(Snapshot &snapshot);
+Rng snapshot_rng(Snapshot &snapshot);
+
+// text file:
+//     "tssnapshot 2", source key, generator state, haplotype count,
+//     one "mutation,mutation,...," line per haplotype, run count,
+//     one "haplotype:individuals" line per run
+// false if the file could not be written
+bool snapshot_to_file(Snapshot &snapshot, std::string output_file);
+// false if the file is missing, incomplete or corrupt
+bool snapshot_from_file(Snapshot &snapshot, std::string input_file);
+
+#endif
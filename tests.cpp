@@ -2,45 +2,84 @@
 #include <cmath>
 #include <vector>
 #include <cassert>
+#include <cstdio>
+#include <fstream>
 #include <iostream>
+#include <sstream>
+#include <string>
 
 #include "tests.hpp"
 #include "utils.hpp"
 #include "simulation/genome.hpp"
 #include "simulation/population.hpp"
+#include "simulation/clones.hpp"
+#include "simulation/snapshot.hpp"
 
 
 using std::cout;
 using std::endl;
 using std::vector;
 
-int random_seed = time(NULL);
+Rng rng = make_rng(time(NULL), 0);
 
 int main() {
     test_uniform_random_in_range();
     test_poisson_dist();
+    test_make_rng();
+    test_hypergeometric_dist();
     test_add_random_mutation();
     test_copy_genome();
+    test_copy_genome_shares_lineage();
+    test_long_lineage_release();
     test_init_population();
     test_replicate_population();
     test_mutate_population();
     test_select_population();
     test_transmit();
+    test_population_to_binary_file();
+    test_population_haplotypes();
+    test_mutate_clones();
+    test_reproduce_clones();
+    test_transmit_clones();
+    test_clone_haplotypes();
+    test_snapshot_round_trip();
+    test_snapshot_clones();
 }
 
 
 void test_poisson_dist() {
     int actual;
     for (int i = 0; i < 100; i++) {
-        actual = poisson_dist(10, random_seed * i);
+        actual = poisson_dist(10, rng);
         assert(actual < 25 && "small random chance of failure, rerun");
         assert(actual >= 0);
     }
 }
+void test_make_rng() {
+    SimulationParameters params{};
+    params.mutation_rate = 0.001;
+    params.genome_length = 1000;
+    params.carrying_capacity = 50;
+
+    // the same seed and repetition evolve the same population
+    vector<vector<int>> evolved[3];
+    int repetitions[3] = {0, 0, 1};
+    for (int i = 0; i < 3; i++) {
+        Rng repetition_rng = make_rng(7, repetitions[i]);
+        vector<Genome*> pop = init_population();
+        evolve_population(pop, params, 20, repetition_rng);
+        for (Genome* genome : pop) {
+            evolved[i].push_back(genome_mutations(genome));
+        }
+        free_population(pop);
+    }
+    assert(evolved[0] == evolved[1]);
+    assert(evolved[0] != evolved[2] && "small random chance of failure");
+}
 void test_uniform_random_in_range() {
     int actual;
     for (int i = 0; i < 100; i++) {
-        actual = uniform_random_in_range(10, time(NULL) * i);
+        actual = uniform_random_in_range(10, rng);
         assert(actual < 10);
         assert(actual >= 0);
     }
@@ -49,7 +88,7 @@ void test_uniform_random_in_range() {
 void test_add_random_mutation() {
     Genome* genome = new Genome;
     for (int i = 0; i < 5; i++) {
-        add_random_mutation(genome, 1000);
+        add_random_mutation(genome, 1000, rng);
     }
     assert(genome->mutations.size() == 5);
 
@@ -66,13 +105,44 @@ void test_add_random_mutation() {
 void test_copy_genome() {
     Genome* genome = new Genome;
     for (int i = 0; i < 10; i++) {
-        add_random_mutation(genome, 100);
+        add_random_mutation(genome, 100, rng);
     }
 
+    vector<int> mutations = genome_mutations(genome);
     Genome* copied_genome = copy_genome(genome);
-    for (int i = 0; i < 10; i++) {
-        assert(genome->mutations[i] == copied_genome->mutations[i]);
+    assert(genome_mutations(genome) == mutations);
+    assert(genome_mutations(copied_genome) == mutations);
+}
+void test_copy_genome_shares_lineage() {
+    Genome* genome = new Genome;
+    genome->mutations = {1, 2};
+    Genome* copied_genome = copy_genome(genome);
+    assert(copied_genome->ancestry == genome->ancestry);
+
+    // new mutations stay with the genome they were added to
+    genome->mutations.push_back(3);
+    copied_genome->mutations.push_back(4);
+    Genome* grandchild = copy_genome(copied_genome);
+    grandchild->mutations.push_back(5);
+    assert(genome_mutations(genome) == vector<int>({1, 2, 3}));
+    assert(genome_mutations(copied_genome) == vector<int>({1, 2, 4}));
+    assert(genome_mutations(grandchild) == vector<int>({1, 2, 4, 5}));
+    assert(genome_length(grandchild) == 4);
+
+    delete copied_genome;
+    assert(genome_mutations(grandchild) == vector<int>({1, 2, 4, 5}));
+    delete genome;
+    delete grandchild;
+}
+void test_long_lineage_release() {
+    // deep enough to overflow the stack if released recursively
+    Genome* genome = new Genome;
+    for (int i = 0; i < 1000000; i++) {
+        genome->mutations.push_back(i);
+        delete copy_genome(genome);
     }
+    assert(genome_length(genome) == 1000000);
+    delete genome;
 }
 
 void test_init_population() {
@@ -95,7 +165,7 @@ void test_mutate_population() {
     int previous_mutation_count = count_mutations_in_population(&pop);
     int current_mutation_count;
     for (int i = 0; i < 10; i++) {
-        mutate_population(pop, 0.01, 100);
+        mutate_population(pop, 0.01, 100, rng);
         current_mutation_count = count_mutations_in_population(&pop);
         assert(current_mutation_count > previous_mutation_count
                && "small random chance of failure, rerun");
@@ -108,9 +178,9 @@ void test_select_population() {
     for (int i = 0; i < 10; i++) {
         replicate_population(pop);
     } 
-    select_population(pop, 50);
+    select_population(pop, 50, rng);
     assert(pop.size() == 50);
-    select_population(pop, 3);
+    select_population(pop, 3, rng);
     assert(pop.size() == 3);
 }
 void test_transmit() {
@@ -120,20 +190,237 @@ void test_transmit() {
     } 
 
     vector<Genome*> rec_pop;
-    transmit(src_pop, rec_pop, std::pow(2, 9));
+    transmit(src_pop, rec_pop, std::pow(2, 9), rng);
     assert(rec_pop.size() == std::pow(2, 9));
 
     vector<Genome*> rec_pop_bottleneck;
-    transmit(src_pop, rec_pop_bottleneck, 42);
+    transmit(src_pop, rec_pop_bottleneck, 42, rng);
     assert(rec_pop_bottleneck.size() == 42);
 }
+void test_population_to_binary_file() {
+    vector<Genome*> pop = init_population();
+    replicate_population(pop);
+    replicate_population(pop);
+    pop[1]->mutations = {5, 9};
+    pop[3]->mutations = {7};
+
+    SimulationParameters params{};
+    params.run_id = 3;
+    params.repetition = 2;
+    params.genome_length = 100;
+    population_to_binary_file(pop, "test_population.bin", params);
+
+    std::ifstream file("test_population.bin", std::ios::binary);
+    BinaryPopulationHeader header;
+    file.read(reinterpret_cast<char*>(&header), sizeof(header));
+    assert(std::string(header.magic, 8) == "TSPOPBIN");
+    assert(header.genome_count == 4);
+    assert(header.mutation_count == 3);
+    assert(header.run_id == 3 && header.repetition == 2);
+
+    uint64_t offsets[5];
+    file.read(reinterpret_cast<char*>(offsets), sizeof(offsets));
+    assert(offsets[1] == 0 && offsets[2] == 2 && offsets[4] == 3);
+    int32_t mutations[3];
+    file.read(reinterpret_cast<char*>(mutations), sizeof(mutations));
+    assert(mutations[0] == 5 && mutations[1] == 9 && mutations[2] == 7);
+    file.close();
+    std::remove("test_population.bin");
+}
+void test_population_haplotypes() {
+    vector<Genome*> pop = init_population();
+    pop[0]->mutations = {4, 2};
+    replicate_population(pop);
+    replicate_population(pop);
+    pop[1]->mutations.push_back(9);
+    // same mutations as the clones through a different lineage
+    pop.push_back(new Genome);
+    pop[4]->mutations = {4, 2};
+
+    vector<Haplotype> haplotypes = population_haplotypes(pop);
+    assert(haplotypes.size() == 2);
+    assert(haplotypes[0].mutations == vector<int>({4, 2}));
+    assert(haplotypes[0].count == 4);
+    assert(haplotypes[1].mutations == vector<int>({4, 2, 9}));
+    assert(haplotypes[1].count == 1);
+
+    haplotypes_to_file(haplotypes, "test_population.hap");
+    std::ifstream file("test_population.hap");
+    std::string line;
+    std::getline(file, line);
+    assert(line == "4:4,2,");
+    std::getline(file, line);
+    assert(line == "1:4,2,9,");
+    file.close();
+    std::remove("test_population.hap");
+}
+
+void test_hypergeometric_dist() {
+    // only one outcome is possible
+    assert(hypergeometric_dist(5, 0, 3, rng) == 3);
+    assert(hypergeometric_dist(0, 5, 3, rng) == 0);
+    assert(hypergeometric_dist(4, 6, 10, rng) == 4);
+
+    long total = 0;
+    for (int i = 0; i < 1000; i++) {
+        long actual = hypergeometric_dist(200000, 200000, 100000, rng);
+        assert(actual >= 0 && actual <= 100000);
+        total += actual;
+    }
+    assert(std::abs(total / 1000.0 - 50000) < 50 &&
+           "small random chance of failure, rerun");
+}
+
+void test_mutate_clones() {
+    vector<Clone> clones = init_clones();
+    clones[0].count = 1000;
+    mutate_clones(clones, 0.01, 1000, rng);
+
+    // mutated individuals leave the founder clone
+    assert(count_individuals(clones) == 1000);
+    int mutations = 0;
+    for (Clone &clone : clones) {
+        mutations += clone.count * genome_length(clone.genome);
+    }
+    assert(mutations > 0 && "small random chance of failure, rerun");
+    assert(clones[0].count == 1000 - (clones.size() - 1));
+    free_clones(clones);
+}
+
+void test_reproduce_clones() {
+    vector<Clone> clones = init_clones();
+    clones[0].count = 3;
+    clones.push_back(Clone{new Genome, 4});
+
+    // below carrying capacity every individual keeps both offspring
+    reproduce_clones(clones, 100, rng);
+    assert(clones.size() == 2);
+    assert(clones[0].count == 6);
+    assert(clones[1].count == 8);
+
+    reproduce_clones(clones, 10, rng);
+    assert(count_individuals(clones) == 10);
+    for (Clone &clone : clones) {
+        assert(clone.count > 0);
+    }
+    free_clones(clones);
+}
+
+void test_transmit_clones() {
+    vector<Clone> source = init_clones();
+    source[0].count = 10;
+    source[0].genome->mutations = {1, 2};
+    vector<Clone> recipient;
+    transmit_clones(source, recipient, 5, rng);
+
+    assert(recipient.size() == 1);
+    assert(recipient[0].count == 5);
+    assert(recipient[0].genome->ancestry == source[0].genome->ancestry);
+    assert(genome_mutations(recipient[0].genome) == vector<int>({1, 2}));
+    free_clones(source);
+    free_clones(recipient);
+}
+
+void test_clone_haplotypes() {
+    vector<Clone> clones = init_clones();
+    clones[0].count = 2;
+    clones[0].genome->mutations = {4, 2};
+    // same mutations through a different lineage
+    clones.push_back(Clone{new Genome, 3});
+    clones[1].genome->mutations = {4, 2};
+    clones.push_back(Clone{new Genome, 1});
+
+    vector<Haplotype> haplotypes = clone_haplotypes(clones);
+    assert(haplotypes.size() == 2);
+    assert(haplotypes[0].mutations == vector<int>({4, 2}));
+    assert(haplotypes[0].count == 5);
+    assert(haplotypes[1].mutations.empty());
+    assert(haplotypes[1].count == 1);
+
+    vector<Genome*> population = expand_clones(clones);
+    assert(population.size() == 6);
+    assert(population[0] == clones[0].genome);
+    assert(population[5] == clones[2].genome);
+    free_clones(clones);
+}
+
+void test_snapshot_round_trip() {
+    vector<Genome*> pop = init_population();
+    pop[0]->mutations = {4, 2};
+    replicate_population(pop);
+    pop.push_back(new Genome);
+    pop.push_back(copy_genome(pop[0]));
+    Rng source_rng = make_rng(3, 0);
+    Snapshot snapshot = population_snapshot(pop, source_rng);
+    snapshot.source_key = "seed 3";
+    assert(snapshot.haplotypes.size() == 2);
+    assert(snapshot.runs.size() == 3);
+
+    assert(snapshot_to_file(snapshot, "test_snapshot.snap"));
+    assert(!snapshot_to_file(snapshot, "missing_directory/test.snap"));
+    Snapshot loaded;
+    assert(snapshot_from_file(loaded, "test_snapshot.snap"));
+    assert(loaded.source_key == "seed 3");
+    std::remove("test_snapshot.snap");
+    assert(!snapshot_from_file(loaded, "test_snapshot.snap"));
+
+    // corrupt snapshots are rejected rather than crashing the run
+    std::ostringstream state;
+    state << source_rng;
+    for (std::string haplotype : {"4,x,", "99999999999,", "4,,2,"}) {
+        std::ofstream corrupt("test_snapshot.snap");
+        corrupt << "tssnapshot 2\nseed 3\n" << state.str() << "\n1\n"
+                << haplotype << "\n1\n0:1\n";
+        corrupt.close();
+        Snapshot rejected;
+        assert(!snapshot_from_file(rejected, "test_snapshot.snap"));
+    }
+    std::ofstream corrupt("test_snapshot.snap");
+    corrupt << "tssnapshot 2\nseed 3\nnot a state\n0\n0\n";
+    corrupt.close();
+    Snapshot rejected;
+    assert(!snapshot_from_file(rejected, "test_snapshot.snap"));
+    std::remove("test_snapshot.snap");
+
+    // individuals come back in order and the generator where it was left
+    vector<Genome*> restored = snapshot_population(loaded);
+    assert(restored.size() == pop.size());
+    for (int i = 0; i < pop.size(); i++) {
+        assert(genome_mutations(restored[i]) == genome_mutations(pop[i]));
+    }
+    Rng restored_rng = snapshot_rng(loaded);
+    assert(restored_rng() == source_rng());
+    free_population(pop);
+    free_population(restored);
+}
+
+void test_snapshot_clones() {
+    vector<Clone> clones = init_clones();
+    clones[0].count = 3;
+    clones.push_back(Clone{new Genome, 2});
+    clones[1].genome->mutations = {5};
+    Snapshot snapshot = clones_snapshot(clones, rng);
+
+    vector<Clone> restored = snapshot_clones(snapshot);
+    assert(restored.size() == 2);
+    assert(restored[0].count == 3);
+    assert(genome_mutations(restored[1].genome) == vector<int>({5}));
+
+    // either engine restores the other's population
+    vector<Genome*> population = snapshot_population(snapshot);
+    assert(population.size() == 5);
+    assert(genome_mutations(population[4]) == vector<int>({5}));
+    free_clones(clones);
+    free_clones(restored);
+    free_population(population);
+}
 
 
 // helpers
 int count_mutations_in_population(vector<Genome*>* population) {
     int count = 0;
     for (int i = 0; i < population->size(); i++) {
-        count += population->at(i)->mutations.size();
+        count += genome_length(population->at(i));
     }
     return count;
 }
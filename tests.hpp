@@ -6,15 +6,29 @@
 
 void test_uniform_random_in_range();
 void test_poisson_dist();
+void test_make_rng();
+void test_hypergeometric_dist();
 
 void test_add_random_mutation();
 void test_copy_genome();
+void test_copy_genome_shares_lineage();
+void test_long_lineage_release();
 
 void test_init_population();
 void test_replicate_population();
 void test_mutate_population();
 void test_select_population();
 void test_transmit();
+void test_population_to_binary_file();
+void test_population_haplotypes();
+
+void test_mutate_clones();
+void test_reproduce_clones();
+void test_transmit_clones();
+void test_clone_haplotypes();
+
+void test_snapshot_round_trip();
+void test_snapshot_clones();
 
 int count_mutations_in_population(std::vector<Genome*>* population);
 
@@ -6,19 +6,23 @@
 #include <iostream>
 #include <fstream>
 
+#include <algorithm>
+#include <random>
 #include <vector>
 using std::vector;
 
 #include "utils.hpp"
 
 
-int poisson_dist(int expected, int seed) {
+Rng make_rng(int seed, int repetition) {
+    // independent streams for the repetitions of one seed
+    std::seed_seq seq{seed, repetition};
+    return Rng(seq);
+}
 
-    static int seeded = 0;
-    if (!seeded) {
-        srand(seed * time(NULL));
-        seeded = 1;
-    }
+int poisson_dist(int expected, Rng &rng) {
+
+    std::uniform_real_distribution<double> uniform(0, 1);
 
     int remainder = expected;
     int n = 0;
@@ -26,7 +30,7 @@ int poisson_dist(int expected, int seed) {
     double p = 1;
 
     do {
-        double rand_num = rand() / (double)RAND_MAX;
+        double rand_num = uniform(rng);
         p *= rand_num;
         n++;
 
@@ -45,23 +49,56 @@ int poisson_dist(int expected, int seed) {
 }
 
 // get random number in range [0, limit)
-int uniform_random_in_range(int limit, int seed) {
+int uniform_random_in_range(int limit, Rng &rng) {
+    // the distribution avoids modulo skew
+    std::uniform_int_distribution<int> uniform(0, limit - 1);
+    return uniform(rng);
+}
 
-    // seed random number generator
-    static int seeded = 0;
-    if (!seeded) {
-        srand(seed * time(NULL));
-        seeded = 1;
+// number of good items among draws taken without replacement from good + bad
+long hypergeometric_dist(long good, long bad, long draws, Rng &rng) {
+    long low = std::max(0L, draws - bad);
+    long high = std::min(good, draws);
+    if (low == high) {
+        return low;
     }
 
-    // avoid modulo skew
-    int limit_multiples = RAND_MAX / limit;
-    int skew_zone_bottom = limit_multiples * limit;
-
-    int random_num;
-    do {
-        random_num = rand();
-    } while (random_num > skew_zone_bottom);
+    // inversion outwards from the mode, so the expected number of steps is
+    // of the order of the standard deviation
+    long mode = (long)((draws + 1.0) * (good + 1.0) / (good + bad + 2.0));
+    mode = std::min(std::max(mode, low), high);
+    double mode_pmf = exp(
+        lgamma(good + 1.0) - lgamma(mode + 1.0) - lgamma(good - mode + 1.0)
+        + lgamma(bad + 1.0) - lgamma(draws - mode + 1.0)
+        - lgamma(bad - draws + mode + 1.0)
+        - lgamma(good + bad + 1.0) + lgamma(draws + 1.0)
+        + lgamma(good + bad - draws + 1.0));
 
-    return random_num % limit;
+    std::uniform_real_distribution<double> uniform(0, 1);
+    double u = uniform(rng) - mode_pmf;
+    long up = mode, down = mode;
+    double up_pmf = mode_pmf, down_pmf = mode_pmf;
+    while (u > 0 && (up < high || down > low)) {
+        if (up < high) {
+            // p(k + 1) / p(k)
+            up_pmf *= (double)(good - up) * (draws - up)
+                      / ((up + 1.0) * (bad - draws + up + 1.0));
+            up++;
+            u -= up_pmf;
+            if (u <= 0) {
+                return up;
+            }
+        }
+        if (down > low) {
+            down_pmf *= (double)down * (bad - draws + down)
+                        / ((good - down + 1.0) * (draws - down + 1.0));
+            down--;
+            u -= down_pmf;
+            if (u <= 0) {
+                return down;
+            }
+        }
+    }
+    // u left over from rounding
+    return mode;
 }
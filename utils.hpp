@@ -1,11 +1,18 @@
 #ifndef UTILS_HPP
 #define UTILS_HPP
 
+#include <random>
 #include <vector>
 #include <string>
 
-int poisson_dist(int expected, int seed);
-int uniform_random_in_range(int limit, int seed);
+// every simulation repetition owns one generator, passed to everything that
+// draws random numbers
+typedef std::mt19937_64 Rng;
+
+Rng make_rng(int seed, int repetition);
+int poisson_dist(int expected, Rng &rng);
+int uniform_random_in_range(int limit, Rng &rng);
+long hypergeometric_dist(long good, long bad, long draws, Rng &rng);
 void write_gzip_file(std::string input_file, std::string compressed_file);
 
-#endif
\ No newline at end of file
+#endif